@@ -0,0 +1,135 @@
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import Future
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Refresh this many seconds before the token actually expires
+AMADEUS_TOKEN_REFRESH_MARGIN = float(os.getenv("AMADEUS_TOKEN_REFRESH_MARGIN", "300"))
+# Amadeus test tokens live ~30 minutes; used when the response has no expires_in
+AMADEUS_TOKEN_DEFAULT_TTL = 1799
+
+
+class AmadeusTokenManager:
+    """
+    Caches the Amadeus OAuth2 token and refreshes it before it expires.
+
+    Works from both threads and coroutines: a single refresh is in flight at any
+    time (a concurrent.futures.Future that sync callers block on and async callers
+    await), and once the token enters the refresh window callers keep getting the
+    cached token while one background refresh replaces it.
+    """
+
+    def __init__(self, fetch, afetch, refresh_margin: float = AMADEUS_TOKEN_REFRESH_MARGIN):
+        # fetch() / await afetch() return the raw token endpoint JSON
+        self._fetch = fetch
+        self._afetch = afetch
+        self._refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+        self._refresh_at = 0.0
+        self._inflight = None
+        self._tasks = set()
+        self._stats = {"hits": 0, "misses": 0, "refreshes": 0, "failures": 0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats)
+
+    def invalidate(self):
+        """
+        Drop the cached token (e.g. after a 401) so the next caller fetches a new one.
+        """
+        with self._lock:
+            self._token = None
+            self._expires_at = self._refresh_at = 0.0
+
+    def _lookup(self):
+        """
+        Must hold self._lock. Returns (token, future, owner):
+        token is set when the cached one can be used right now; future/owner
+        describe the refresh the caller should start (owner) or wait on.
+        """
+        now = time.monotonic()
+        if self._token and now < self._refresh_at:
+            self._stats["hits"] += 1
+            return self._token, None, False
+
+        owner = self._inflight is None
+        if owner:
+            self._inflight = Future()
+        future = self._inflight
+
+        if self._token and now < self._expires_at:
+            # still valid: serve it and let the owner refresh in the background
+            self._stats["hits"] += 1
+            return self._token, future, owner
+
+        self._stats["misses"] += 1
+        return None, future, owner
+
+    def _resolve(self, future: Future, body):
+        token = body.get("access_token") if isinstance(body, dict) else None
+        if not token:
+            reason = body.get("error_description", "no access_token in response") if isinstance(body, dict) else body
+            self._reject(future, RuntimeError(f"Amadeus token request failed: {reason}"))
+            return
+        ttl = float(body.get("expires_in") or AMADEUS_TOKEN_DEFAULT_TTL)
+        now = time.monotonic()
+        with self._lock:
+            self._token = token
+            self._expires_at = now + ttl
+            self._refresh_at = now + max(ttl - self._refresh_margin, ttl / 2)
+            self._stats["refreshes"] += 1
+            self._inflight = None
+        future.set_result(token)
+
+    def _reject(self, future: Future, exc: BaseException):
+        with self._lock:
+            self._stats["failures"] += 1
+            self._inflight = None
+        future.set_exception(exc)
+
+    def _refresh(self, future: Future):
+        try:
+            body = self._fetch()
+        except BaseException as e:
+            self._reject(future, e)
+            return
+        self._resolve(future, body)
+
+    async def _arefresh(self, future: Future):
+        try:
+            body = await self._afetch()
+        except BaseException as e:
+            self._reject(future, e)
+            return
+        self._resolve(future, body)
+
+    def get_token(self) -> str:
+        with self._lock:
+            token, future, owner = self._lookup()
+        if token:
+            if owner:
+                threading.Thread(target=self._refresh, args=(future,), daemon=True).start()
+            return token
+        if owner:
+            self._refresh(future)
+        return future.result()
+
+    async def aget_token(self) -> str:
+        with self._lock:
+            token, future, owner = self._lookup()
+        if owner:
+            # A task rather than awaiting inline, so a caller that gets cancelled
+            # (e.g. an agent over its time budget) doesn't abort everyone's refresh
+            task = asyncio.get_running_loop().create_task(self._arefresh(future))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if token:
+            return token
+        return await asyncio.shield(asyncio.wrap_future(future))
@@ -0,0 +1,362 @@
+import os
+import json
+import time
+import sqlite3
+import inspect
+import hashlib
+import threading
+import functools
+from collections import OrderedDict
+import httpx
+import requests
+from dotenv import load_dotenv
+
+from singleflight import SingleFlight
+from resilience import UpstreamUnavailable
+
+load_dotenv()
+
+# "memory" (default) or "sqlite" to survive restarts
+API_CACHE_BACKEND = os.getenv("API_CACHE_BACKEND", "memory")
+API_CACHE_PATH = os.getenv("API_CACHE_PATH", "api_cache.sqlite3")
+API_CACHE_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# After its TTL an entry is still served (while one refresh runs) for ttl * this factor
+API_CACHE_STALE_FACTOR = float(os.getenv("API_CACHE_STALE_FACTOR", "1"))
+# ...and kept for ttl * this factor beyond that, served only while the provider is unavailable
+API_CACHE_FALLBACK_FACTOR = float(os.getenv("API_CACHE_FALLBACK_FACTOR", "4"))
+
+# Failures that mean the provider couldn't be reached: refused locally by the
+# breaker/rate limiter, or a transport error that outlived the retries
+UNREACHABLE = (UpstreamUnavailable, httpx.HTTPError, requests.RequestException)
+
+# Seconds each endpoint's responses stay fresh
+CACHE_POLICIES = {
+    "weather": 30 * 60,
+    "exchange_rate": 60 * 60,
+    "country_info": 7 * 24 * 3600,
+    "photos": 7 * 24 * 3600,
+    "places": 24 * 3600,
+    "google_places": 24 * 3600,
+    "place_details": 24 * 3600,
+    "hotels": 6 * 3600,
+    "flights": 15 * 60,
+}
+DEFAULT_TTL = 15 * 60
+
+# Free-text / code arguments whose case and spacing don't change the answer.
+# Everything else (e.g. Google place_id, which is case-sensitive) is keyed as given.
+FOLDED_ARGS = {
+    "weather": {"city"},
+    "places": {"query", "location"},
+    "exchange_rate": {"base", "target"},
+    "flights": {"origin", "destination"},
+    "hotels": {"city_code"},
+    "google_places": {"query"},
+    "country_info": {"country"},
+    "photos": {"query"},
+}
+
+
+class MemoryCache:
+    """
+    In-process LRU keyed by string, bounded by the total size of the stored JSON.
+    """
+
+    def __init__(self, max_bytes: int = API_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """
+        Returns (payload, expires_at) or None.
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            self._data.move_to_end(key)
+            return item
+
+    def set(self, key: str, payload: str, expires_at: float):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+            self._data[key] = (payload, expires_at)
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes and len(self._data) > 1:
+                _, (evicted, _) = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def delete(self, key: str):
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[0])
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def size(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._data), "bytes": self._bytes}
+
+
+class SQLiteCache:
+    """
+    On-disk cache with the same interface as MemoryCache.
+    Rows carry a last-access time so the oldest are evicted past max_bytes.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str = API_CACHE_PATH, max_bytes: int = API_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS api_cache ("
+            "key TEXT PRIMARY KEY, payload TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM api_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE api_cache SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0], row[1]
+
+    def set(self, key: str, payload: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO api_cache (key, payload, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, expires_at, time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self):
+        # Drop expired rows first, then least recently used until under the cap
+        self._conn.execute("DELETE FROM api_cache WHERE expires_at < ?", (time.time(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM api_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, LENGTH(payload) FROM api_cache ORDER BY accessed_at").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM api_cache WHERE key = ?", doomed)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM api_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM api_cache")
+            self._conn.commit()
+
+    def size(self) -> dict:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0) FROM api_cache"
+            ).fetchone()
+        return {"entries": entries, "bytes": size}
+
+
+def _make_backend():
+    if API_CACHE_BACKEND == "sqlite":
+        return SQLiteCache()
+    return MemoryCache()
+
+
+backend = _make_backend()
+flights = SingleFlight()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def _count(endpoint: str, field: str):
+    with _stats_lock:
+        counters = _stats.setdefault(endpoint, {"hits": 0, "stale_hits": 0, "misses": 0, "fallback_hits": 0})
+        counters[field] += 1
+
+
+def cache_stats() -> dict:
+    with _stats_lock:
+        stats = {name: dict(c) for name, c in _stats.items()}
+    stats["_backend"] = backend.size()
+    stats["_singleflight"] = flights.stats()
+    return stats
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    return value
+
+
+def make_key(endpoint: str, signature: inspect.Signature, args, kwargs) -> str:
+    """
+    Key on the bound arguments (defaults applied, FOLDED_ARGS case/whitespace-folded)
+    so get_weather("Goa") and get_weather(" goa ", days=3) share an entry.
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    folded = FOLDED_ARGS.get(endpoint, ())
+    arguments = {name: _normalize(value) if name in folded else value for name, value in bound.arguments.items()}
+    raw = json.dumps(arguments, sort_keys=True, default=str)
+    return f"{endpoint}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+
+def _is_cacheable(value) -> bool:
+    # Never pin upstream failures; wrappers report them as {"error": ...} / {"errors": [...]}
+    if isinstance(value, dict) and ("error" in value or "errors" in value):
+        return False
+    return value is not None
+
+
+def _lookup(key: str, fallback: bool = False):
+    """
+    Returns (value, is_fresh) or None. Backends store the hard expiry (end of
+    the fallback window); the fresh and stale deadlines travel in the payload.
+    Entries past their stale window are only returned when `fallback` is set.
+    """
+    item = backend.get(key)
+    if item is None:
+        return None
+    payload, expires_at = item
+    now = time.time()
+    if expires_at < now:
+        return None
+    entry = json.loads(payload)
+    if not isinstance(entry, dict) or "value" not in entry or "fresh_until" not in entry:
+        return None  # written by an older cache format; refetch and overwrite it
+    if not fallback and entry.get("stale_until", expires_at) < now:
+        return None
+    return entry["value"], now < entry["fresh_until"]
+
+
+def _store(key: str, value, ttl: float):
+    if _is_cacheable(value):
+        fresh_until = time.time() + ttl
+        stale_until = fresh_until + ttl * API_CACHE_STALE_FACTOR
+        payload = json.dumps({"value": value, "fresh_until": fresh_until, "stale_until": stale_until})
+        backend.set(key, payload, stale_until + ttl * API_CACHE_FALLBACK_FACTOR)
+
+
+def _fallback(key: str, endpoint: str):
+    """
+    Last known good value for a call whose provider is down or erroring, if we still have one.
+    """
+    hit = _lookup(key, fallback=True)
+    if hit is None:
+        return None
+    _count(endpoint, "fallback_hits")
+    return hit[0]
+
+
+def cached(endpoint: str, ttl: float = None):
+    """
+    Cache an api_wrappers function (sync or async) under the endpoint's policy.
+    The sync and async twins of a wrapper use the same endpoint name, so they share entries.
+
+    Concurrent misses for the same key share one upstream call (single-flight), and
+    an expired entry inside its stale window is returned immediately while a single
+    background call refreshes it (stale-while-revalidate). When the provider is
+    unreachable (open breaker, transport error after retries) or answers with an
+    error, an older entry still in its fallback window is served instead.
+    """
+    ttl = ttl if ttl is not None else CACHE_POLICIES.get(endpoint, DEFAULT_TTL)
+
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                key = make_key(endpoint, signature, args, kwargs)
+
+                async def fetch():
+                    value = await fn(*args, **kwargs)
+                    _store(key, value, ttl)
+                    return value
+
+                hit = _lookup(key)
+                if hit is not None:
+                    value, fresh = hit
+                    if not fresh:
+                        _count(endpoint, "stale_hits")
+                        flights.ado_background(key, fetch)
+                    else:
+                        _count(endpoint, "hits")
+                    return value
+                _count(endpoint, "misses")
+                try:
+                    value = await flights.ado(key, fetch)
+                except UNREACHABLE:
+                    value = _fallback(key, endpoint)
+                    if value is None:
+                        raise
+                    return value
+                if not _is_cacheable(value):
+                    older = _fallback(key, endpoint)
+                    return value if older is None else older
+                return value
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = make_key(endpoint, signature, args, kwargs)
+
+            def fetch():
+                value = fn(*args, **kwargs)
+                _store(key, value, ttl)
+                return value
+
+            hit = _lookup(key)
+            if hit is not None:
+                value, fresh = hit
+                if not fresh:
+                    _count(endpoint, "stale_hits")
+                    flights.do_background(key, fetch)
+                else:
+                    _count(endpoint, "hits")
+                return value
+            _count(endpoint, "misses")
+            try:
+                value = flights.do(key, fetch)
+            except UNREACHABLE:
+                value = _fallback(key, endpoint)
+                if value is None:
+                    raise
+                return value
+            if not _is_cacheable(value):
+                older = _fallback(key, endpoint)
+                return value if older is None else older
+            return value
+        return wrapper
+
+    return decorator
@@ -1,8 +1,10 @@
 import os
-import requests
-import serpapi
 from dotenv import load_dotenv
 
+from http_client import get_json, request_json, aget_json, arequest_json
+from amadeus_auth import AmadeusTokenManager
+from api_cache import cached
+
 # Load environment variables
 load_dotenv()
 
@@ -15,24 +17,27 @@ AMADEUS_API_SECRET = os.getenv("AMADEUS_API_SECRET")
 GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
 UNSPLASH_API_KEY = os.getenv("UNSPLASH_API_KEY")
 
+# Each wrapper below has a blocking version and an `a`-prefixed asyncio version.
+# Both share the request parameters and response parsing helpers, and the same
+# response cache entry (see CACHE_POLICIES in api_cache for per-endpoint TTLs).
+
 #  WEATHER (WeatherAPI.com)
 
-def get_weather(city: str, days: int = 3):
-    """
-    Get weather forecast for a city using WeatherAPI.com.
-    """
-    url = f"http://api.weatherapi.com/v1/forecast.json"
-    params = {
+WEATHER_URL = "http://api.weatherapi.com/v1/forecast.json"
+
+
+def _weather_params(city: str, days: int):
+    return {
         "key": WEATHERAPI_KEY,
         "q": city,
         "days": days,
         "aqi": "no",
         "alerts": "no"
     }
-    response = requests.get(url, params=params)
-    data = response.json()
 
-    if response.status_code != 200 or "forecast" not in data:
+
+def _parse_weather(status: int, data):
+    if status != 200 or "forecast" not in data:
         return {"error": data.get("error", {}).get("message", "Weather data not available")}
 
     forecast = []
@@ -45,14 +50,26 @@ def get_weather(city: str, days: int = 3):
         })
     return forecast
 
-#  PLACES (SerpAPI - Google Maps Results)
 
-def search_places(query: str, location: str, num_results: int = 5):
+@cached("weather")
+def get_weather(city: str, days: int = 3):
     """
-    Search for places using SerpAPI's Google Maps engine.
+    Get weather forecast for a city using WeatherAPI.com.
     """
-    url = "https://serpapi.com/search"
-    params = {
+    return _parse_weather(*get_json(WEATHER_URL, params=_weather_params(city, days), endpoint="weather"))
+
+
+@cached("weather")
+async def aget_weather(city: str, days: int = 3):
+    return _parse_weather(*await aget_json(WEATHER_URL, params=_weather_params(city, days), endpoint="weather"))
+
+#  PLACES (SerpAPI - Google Maps Results)
+
+SERPAPI_URL = "https://serpapi.com/search"
+
+
+def _places_params(query: str, location: str):
+    return {
         "engine": "google_maps",
         "q": query,
         "location": location,
@@ -60,9 +77,9 @@ def search_places(query: str, location: str, num_results: int = 5):
         "type": "search",
         "api_key": SERPAPI_KEY
     }
-    response = requests.get(url, params=params)
-    data = response.json()
 
+
+def _parse_places(status: int, data, num_results: int):
     if "local_results" not in data:
         return {"error": data.get("error", "No results found")}
 
@@ -78,47 +95,107 @@ def search_places(query: str, location: str, num_results: int = 5):
         })
     return results
 
-#  CURRENCY (ExchangeRate API)
 
-def get_exchange_rate(base: str = "USD", target: str = "INR"):
+@cached("places")
+def search_places(query: str, location: str, num_results: int = 5):
     """
-    Get real-time exchange rate between two currencies.
+    Search for places using SerpAPI's Google Maps engine.
     """
-    url = f"http://api.exchangeratesapi.io/v1/latest?access_key={EXCHANGE_API_KEY}&symbols={base},{target}"
-    response = requests.get(url)
-    data = response.json()
+    status, data = get_json(SERPAPI_URL, params=_places_params(query, location), endpoint="places")
+    return _parse_places(status, data, num_results)
+
+
+@cached("places")
+async def asearch_places(query: str, location: str, num_results: int = 5):
+    status, data = await aget_json(SERPAPI_URL, params=_places_params(query, location), endpoint="places")
+    return _parse_places(status, data, num_results)
+
+#  CURRENCY (ExchangeRate API)
+
+EXCHANGE_URL = "http://api.exchangeratesapi.io/v1/latest"
+
 
-    if response.status_code != 200 or "rates" not in data:
+def _exchange_params(base: str, target: str):
+    return {"access_key": EXCHANGE_API_KEY, "symbols": f"{base},{target}"}
+
+
+def _parse_exchange_rate(status: int, data, base: str, target: str):
+    if status != 200 or "rates" not in data:
         return {"error": data.get("error", "Exchange rate data not available")}
 
     rate = data["rates"].get(target) / data["rates"].get(base)
     return {"base": base, "target": target, "rate": rate}
 
-#  AMADEUS API (Flights + Hotels)
 
-def get_amadeus_access_token():
+@cached("exchange_rate")
+def get_exchange_rate(base: str = "USD", target: str = "INR"):
     """
-    Get OAuth2 access token from Amadeus API.
+    Get real-time exchange rate between two currencies.
     """
-    url = "https://test.api.amadeus.com/v1/security/oauth2/token"
+    status, data = get_json(EXCHANGE_URL, params=_exchange_params(base, target), endpoint="exchange_rate")
+    return _parse_exchange_rate(status, data, base, target)
+
+
+@cached("exchange_rate")
+async def aget_exchange_rate(base: str = "USD", target: str = "INR"):
+    status, data = await aget_json(EXCHANGE_URL, params=_exchange_params(base, target), endpoint="exchange_rate")
+    return _parse_exchange_rate(status, data, base, target)
+
+#  AMADEUS API (Flights + Hotels)
+
+AMADEUS_TOKEN_URL = "https://test.api.amadeus.com/v1/security/oauth2/token"
+AMADEUS_FLIGHTS_URL = "https://test.api.amadeus.com/v2/shopping/flight-offers"
+AMADEUS_HOTELS_URL = "https://test.api.amadeus.com/v1/reference-data/locations/hotels/by-city"
+
+
+def _amadeus_token_request():
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
     data = {
         "grant_type": "client_credentials",
         "client_id": AMADEUS_API_KEY,
         "client_secret": AMADEUS_API_SECRET
     }
-    response = requests.post(url, data=data, headers=headers)
-    return response.json().get("access_token")
+    return headers, data
 
-def search_flights(origin: str, destination: str, departure_date: str, adults: int = 1):
+
+def _fetch_amadeus_token():
+    headers, data = _amadeus_token_request()
+    _, body = request_json("POST", AMADEUS_TOKEN_URL, data=data, headers=headers, endpoint="amadeus_token")
+    return body
+
+
+async def _afetch_amadeus_token():
+    headers, data = _amadeus_token_request()
+    _, body = await arequest_json("POST", AMADEUS_TOKEN_URL, data=data, headers=headers, endpoint="amadeus_token")
+    return body
+
+
+# Shared token cache; amadeus_tokens.stats() exposes hit/miss/refresh counters
+amadeus_tokens = AmadeusTokenManager(_fetch_amadeus_token, _afetch_amadeus_token)
+
+
+def get_amadeus_access_token():
     """
-    Search flights using Amadeus API.
-    Example date: '2025-09-01'
+    Get OAuth2 access token from Amadeus API (cached until shortly before expiry).
     """
-    token = get_amadeus_access_token()
-    url = "https://test.api.amadeus.com/v2/shopping/flight-offers"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {
+    return amadeus_tokens.get_token()
+
+
+async def aget_amadeus_access_token():
+    return await amadeus_tokens.aget_token()
+
+
+def _amadeus_body(status: int, data):
+    # A rejected token means ours was revoked early; next call mints a new one
+    if status == 401:
+        amadeus_tokens.invalidate()
+    if status != 200 and not (isinstance(data, dict) and "errors" in data):
+        return {"error": f"Amadeus request failed (HTTP {status})"}
+    return data
+
+
+def _flight_params(origin: str, destination: str, departure_date: str, adults: int):
+    return {
         "originLocationCode": origin,
         "destinationLocationCode": destination,
         "departureDate": departure_date,
@@ -126,79 +203,166 @@ def search_flights(origin: str, destination: str, departure_date: str, adults: i
         "currencyCode": "USD",
         "max": 3
     }
-    response = requests.get(url, headers=headers, params=params)
-    return response.json()
 
+
+@cached("flights")
+def search_flights(origin: str, destination: str, departure_date: str, adults: int = 1):
+    """
+    Search flights using Amadeus API.
+    Example date: '2025-09-01'
+    """
+    token = get_amadeus_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    params = _flight_params(origin, destination, departure_date, adults)
+    return _amadeus_body(*get_json(AMADEUS_FLIGHTS_URL, params=params, headers=headers, endpoint="flights"))
+
+
+@cached("flights")
+async def asearch_flights(origin: str, destination: str, departure_date: str, adults: int = 1):
+    token = await aget_amadeus_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    params = _flight_params(origin, destination, departure_date, adults)
+    return _amadeus_body(*await aget_json(AMADEUS_FLIGHTS_URL, params=params, headers=headers, endpoint="flights"))
+
+
+@cached("hotels")
 def search_hotels(city_code: str):
     """
     Search hotels in a city using Amadeus API.
     City codes can be IATA (e.g., 'DEL' for Delhi).
     """
     token = get_amadeus_access_token()
-    url = "https://test.api.amadeus.com/v1/reference-data/locations/hotels/by-city"
     headers = {"Authorization": f"Bearer {token}"}
-    params = {"cityCode": city_code}
-    response = requests.get(url, headers=headers, params=params)
-    return response.json()
+    return _amadeus_body(*get_json(AMADEUS_HOTELS_URL, params={"cityCode": city_code}, headers=headers, endpoint="hotels"))
+
+
+@cached("hotels")
+async def asearch_hotels(city_code: str):
+    token = await aget_amadeus_access_token()
+    headers = {"Authorization": f"Bearer {token}"}
+    return _amadeus_body(*await aget_json(AMADEUS_HOTELS_URL, params={"cityCode": city_code}, headers=headers, endpoint="hotels"))
 
 
 # GOOGLE PLACES API
 
-def search_google_places(query: str, location: str, radius: int = 5000):
+GOOGLE_TEXTSEARCH_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+GOOGLE_DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
+
+
+def _google_error(status: int, data):
     """
-    Search for places using Google Places API.
-    Location = "lat,lng"
+    Google answers quota/auth problems with HTTP 200 and a status field, so both are checked.
     """
-    url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-    params = {
+    if not isinstance(data, dict):
+        return {"error": f"Google Places returned HTTP {status}"}
+    api_status = data.get("status", "OK")
+    if status != 200 or api_status not in ("OK", "ZERO_RESULTS") or "error_message" in data:
+        reason = api_status if api_status != "OK" else "request failed"
+        return {"error": data.get("error_message") or f"Google Places {reason} (HTTP {status})"}
+    return None
+
+
+def _parse_google_places(status: int, data):
+    return _google_error(status, data) or data.get("results", [])
+
+
+def _parse_place_details(status: int, data):
+    return _google_error(status, data) or data
+
+
+def _google_places_params(query: str, location: str, radius: int):
+    return {
         "query": query,
         "location": location,
         "radius": radius,
         "key": GOOGLE_PLACES_API_KEY
     }
-    response = requests.get(url, params=params)
-    return response.json().get("results", [])
 
-def get_place_details(place_id: str):
+
+@cached("google_places")
+def search_google_places(query: str, location: str, radius: int = 5000):
     """
-    Get detailed info about a place from Google Places API.
+    Search for places using Google Places API.
+    Location = "lat,lng"
     """
-    url = f"https://maps.googleapis.com/maps/api/place/details/json"
-    params = {
+    return _parse_google_places(*get_json(GOOGLE_TEXTSEARCH_URL, params=_google_places_params(query, location, radius), endpoint="google_places"))
+
+
+@cached("google_places")
+async def asearch_google_places(query: str, location: str, radius: int = 5000):
+    return _parse_google_places(*await aget_json(GOOGLE_TEXTSEARCH_URL, params=_google_places_params(query, location, radius), endpoint="google_places"))
+
+
+def _place_details_params(place_id: str):
+    return {
         "place_id": place_id,
         "fields": "name,rating,formatted_address,formatted_phone_number,website,review,photo",
         "key": GOOGLE_PLACES_API_KEY
     }
-    response = requests.get(url, params=params)
-    return response.json()
+
+
+@cached("place_details")
+def get_place_details(place_id: str):
+    """
+    Get detailed info about a place from Google Places API.
+    """
+    return _parse_place_details(*get_json(GOOGLE_DETAILS_URL, params=_place_details_params(place_id), endpoint="place_details"))
+
+
+@cached("place_details")
+async def aget_place_details(place_id: str):
+    return _parse_place_details(*await aget_json(GOOGLE_DETAILS_URL, params=_place_details_params(place_id), endpoint="place_details"))
 
 #  REST COUNTRIES API
 
+def _parse_country_info(status: int, data):
+    if status != 200 or not isinstance(data, list) or not data:
+        return {"error": "Country data not available"}
+    return data[0]
+
+
+@cached("country_info")
 def get_country_info(country: str):
     """
     Get country info, visa requirements, population, region, etc.
     """
-    url = f"https://restcountries.com/v3.1/name/{country}"
-    response = requests.get(url)
-    if response.status_code != 200:
-        return {"error": "Country data not available"}
-    return response.json()[0]
+    return _parse_country_info(*get_json(f"https://restcountries.com/v3.1/name/{country}", endpoint="country_info"))
+
+
+@cached("country_info")
+async def aget_country_info(country: str):
+    return _parse_country_info(*await aget_json(f"https://restcountries.com/v3.1/name/{country}", endpoint="country_info"))
 
 
 #  UNSPLASH API
 
-def get_destination_photo(query: str, count: int = 1):
-    """
-    Get high-quality destination photos from Unsplash.
-    """
-    url = "https://api.unsplash.com/search/photos"
-    params = {
+UNSPLASH_URL = "https://api.unsplash.com/search/photos"
+
+
+def _photo_params(query: str, count: int):
+    return {
         "query": query,
         "per_page": count,
         "orientation": "landscape",
         "client_id": UNSPLASH_API_KEY
     }
-    response = requests.get(url, params=params)
-    data = response.json()
-    photos = [p["urls"]["regular"] for p in data.get("results", [])]
-    return photos
+
+
+def _parse_photos(status: int, data):
+    if status != 200 or not isinstance(data, dict) or "results" not in data:
+        errors = data.get("errors") if isinstance(data, dict) else None
+        return {"error": "; ".join(errors) if errors else f"Photos not available (HTTP {status})"}
+    return [p["urls"]["regular"] for p in data.get("results", [])]
+
+
+@cached("photos")
+def get_destination_photo(query: str, count: int = 1):
+    """
+    Get high-quality destination photos from Unsplash.
+    """
+    return _parse_photos(*get_json(UNSPLASH_URL, params=_photo_params(query, count), endpoint="photos"))
+
+
+@cached("photos")
+async def aget_destination_photo(query: str, count: int = 1):
+    return _parse_photos(*await aget_json(UNSPLASH_URL, params=_photo_params(query, count), endpoint="photos"))
@@ -0,0 +1,283 @@
+"""
+Bulk itinerary generation from a JSONL file of requests.
+
+Each input line is a request dict, or {"id": ..., "request": {...}}; the id
+defaults to the line number. Results are appended to the output as they
+finish (JSONL, or Parquet part files), and the output doubles as the
+checkpoint: re-running the same command skips ids that already succeeded and
+retries the failed ones (readers keep the last row per id).
+
+Identical requests (same canonical_request) that are in flight together run
+once; later repeats are answered by the response cache, and agents of
+different requests share API results through the API cache's single-flight.
+
+    python batch.py campaign.jsonl --output itineraries.jsonl --concurrency 8 --max-rps 2
+    python batch.py campaign.jsonl --output itineraries.parquet --format parquet --rate-limit amadeus=5,10
+"""
+import os
+
+# A batch would rather wait for a quota slot or a slow agent than lose a
+# section, so the interactive limits are relaxed (read by the app at import).
+# The quota wait stays below the agent budget, or the agent times out first.
+os.environ.setdefault("RATE_LIMIT_MAX_WAIT", "20")
+os.environ.setdefault("AGENT_TIMEOUT", "30")
+os.environ.setdefault("REQUEST_DEADLINE", "45")
+
+import json  # noqa: E402
+import time  # noqa: E402
+import logging  # noqa: E402
+import argparse  # noqa: E402
+from datetime import datetime  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED  # noqa: E402
+
+from response_cache import request_key  # noqa: E402
+from resilience import TokenBucket  # noqa: E402
+
+CONCURRENCY = 8
+FLUSH_EVERY = 100
+PROGRESS_EVERY = 100
+DONE = ("ok", "invalid")
+
+
+def read_requests(path: str):
+    """
+    (id, request, error) per non-blank line, streamed so large files never sit in memory.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield str(line_no), None, f"invalid JSON: {e}"
+                continue
+            if not isinstance(item, dict):
+                yield str(line_no), None, "line is not a JSON object"
+                continue
+            request = item.get("request", item)
+            item_id = str(item.get("id", line_no)) if "request" in item else str(line_no)
+            if not isinstance(request, dict) or not request:
+                yield item_id, None, "request must be a non-empty object"
+                continue
+            yield item_id, request, None
+
+
+#  SINKS (the written rows are also the checkpoint)
+
+class JsonlSink:
+    def __init__(self, path: str, fsync_every: int = FLUSH_EVERY):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._unsynced = 0
+        self._fh = open(path, "a+", encoding="utf-8")
+        # A crash can leave half a line; start the next row on a fresh one
+        self._fh.seek(0, os.SEEK_END)
+        if self._fh.tell():
+            self._fh.seek(self._fh.tell() - 1)
+            if self._fh.read(1) != "\n":
+                self._fh.write("\n")
+
+    def done_ids(self) -> set:
+        done = set()
+        self._fh.seek(0)
+        for line in self._fh:
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if row.get("status") in DONE:
+                done.add(row["id"])
+        self._fh.seek(0, os.SEEK_END)
+        return done
+
+    def write(self, row: dict):
+        self._fh.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._fh.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            os.fsync(self._fh.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+
+
+class ParquetSink:
+    """
+    One part file per `flush_every` rows inside `path/`; a crash loses at most the unflushed rows.
+    """
+
+    def __init__(self, path: str, flush_every: int = FLUSH_EVERY):
+        import pyarrow  # noqa: F401  (fail before any work is done)
+
+        self.path = path
+        self.flush_every = flush_every
+        self._rows = []
+        os.makedirs(path, exist_ok=True)
+
+    def done_ids(self) -> set:
+        import pyarrow.parquet as pq
+
+        done = set()
+        for name in sorted(os.listdir(self.path)):
+            if name.endswith(".parquet"):
+                table = pq.read_table(os.path.join(self.path, name), columns=["id", "status"])
+                done.update(i for i, s in zip(table["id"].to_pylist(), table["status"].to_pylist()) if s in DONE)
+        return done
+
+    def _flush(self):
+        if not self._rows:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(self._rows)
+        name = f"part-{time.time_ns()}-{os.getpid()}"
+        tmp = os.path.join(self.path, f".{name}.tmp")
+        pq.write_table(table, tmp)
+        # rename is atomic, so done_ids never reads a half-written part
+        os.replace(tmp, os.path.join(self.path, f"{name}.parquet"))
+        self._rows = []
+
+    def write(self, row: dict):
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_every:
+            self._flush()
+
+    def close(self):
+        self._flush()
+
+
+def _generate(user_request: dict) -> tuple:
+    from itinerary import generate_itinerary
+
+    started = time.perf_counter()
+    try:
+        return generate_itinerary(user_request), None, time.perf_counter() - started
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}", time.perf_counter() - started
+
+
+def _row(item_id: str, key: str, status: str, itinerary: str = None, error: str = None, seconds: float = 0.0) -> dict:
+    return {
+        "id": item_id,
+        "key": key,
+        "status": status,
+        "itinerary": itinerary,
+        "error": error,
+        "seconds": round(seconds, 3),
+        "finished_at": datetime.now().isoformat(),
+    }
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    fmt: str = "jsonl",
+    concurrency: int = CONCURRENCY,
+    max_rps: float = None,
+    flush_every: int = FLUSH_EVERY,
+) -> dict:
+    """
+    Stream requests -> dedupe in-flight duplicates -> bounded parallel generation -> incremental output.
+    Returns counters plus elapsed time and itineraries/sec.
+    """
+    sink = ParquetSink(output_path, flush_every) if fmt == "parquet" else JsonlSink(output_path, flush_every)
+    done = sink.done_ids()
+    # One LLM call per request, so this also paces Gemini usage
+    bucket = TokenBucket(max_rps, max(1.0, max_rps)) if max_rps else None
+    stats = {"read": 0, "resumed": 0, "deduped": 0, "ok": 0, "failed": 0, "invalid": 0}
+    inflight = {}  # key -> (future, [ids waiting on it])
+    started = time.perf_counter()
+
+    def finish(future):
+        key = next(k for k, (f, _) in inflight.items() if f is future)
+        _, ids = inflight.pop(key)
+        itinerary, error, seconds = future.result()
+        status = "ok" if error is None else "failed"
+        for item_id in ids:
+            sink.write(_row(item_id, key, status, itinerary, error, seconds))
+            stats[status] += 1
+        completed = stats["ok"] + stats["failed"]
+        if completed // PROGRESS_EVERY != (completed - len(ids)) // PROGRESS_EVERY:
+            elapsed = time.perf_counter() - started
+            print(f"{completed} done ({stats['failed']} failed) in {elapsed:.0f}s -> {completed / elapsed:.2f}/s", flush=True)
+
+    def drain(until: int):
+        while len(inflight) > until:
+            finished, _ = wait([f for f, _ in inflight.values()], return_when=FIRST_COMPLETED)
+            for future in finished:
+                finish(future)
+
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        for item_id, user_request, error in read_requests(input_path):
+            stats["read"] += 1
+            if item_id in done:
+                stats["resumed"] += 1
+                continue
+            if error is not None:
+                sink.write(_row(item_id, None, "invalid", error=error))
+                stats["invalid"] += 1
+                continue
+            key = request_key(user_request, "json")
+            if key in inflight:
+                inflight[key][1].append(item_id)
+                stats["deduped"] += 1
+                continue
+            # Keep the pool busy without reading the whole file ahead
+            drain(concurrency * 2 - 1)
+            if bucket is not None:
+                time.sleep(bucket.reserve(float("inf")))
+            inflight[key] = (pool.submit(_generate, user_request), [item_id])
+        drain(0)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        sink.close()
+
+    stats["seconds"] = time.perf_counter() - started
+    generated = stats["ok"] + stats["failed"]
+    stats["per_sec"] = generated / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate itineraries in bulk from a JSONL file of requests")
+    parser.add_argument("input", help="JSONL, one request (or {id, request}) per line")
+    parser.add_argument("--output", required=True, help="JSONL file, or a directory of part files with --format parquet")
+    parser.add_argument("--format", choices=("jsonl", "parquet"), default="jsonl")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--max-rps", type=float, help="cap on new requests (and LLM calls) per second")
+    parser.add_argument("--rate-limit", action="append", default=[], metavar="PROVIDER=RATE[,BURST]",
+                        help="override a provider's quota, e.g. amadeus=5,10 (see resilience.RATE_LIMITS)")
+    parser.add_argument("--flush-every", type=int, default=FLUSH_EVERY, help="rows per fsync / parquet part")
+    args = parser.parse_args()
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    for spec in args.rate_limit:
+        provider, _, value = spec.partition("=")
+        if not value:
+            parser.error(f"--rate-limit expects PROVIDER=RATE[,BURST], got {spec!r}")
+        # Providers read their quota when first used, which is after this
+        os.environ[f"RATE_LIMIT_{provider.strip().upper()}"] = value.strip()
+
+    stats = run_batch(
+        args.input,
+        args.output,
+        fmt=args.format,
+        concurrency=args.concurrency,
+        max_rps=args.max_rps,
+        flush_every=args.flush_every,
+    )
+    print(
+        f"{stats['read']} requests: {stats['ok']} ok, {stats['failed']} failed, {stats['invalid']} invalid, "
+        f"{stats['deduped']} deduped, {stats['resumed']} already done "
+        f"in {stats['seconds']:.1f}s -> {stats['per_sec']:.2f} itineraries/sec"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from dotenv import load_dotenv
+
+from prompt_budget import estimate_tokens
+from sessions import SESSION_IDLE_TTL
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Max tokens of conversation sent with a refinement (latest itinerary included)
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "4000"))
+# Messages kept in process memory per conversation; older ones move to the store
+MEMORY_RAM_MESSAGES = int(os.getenv("MEMORY_RAM_MESSAGES", "6"))
+CONVERSATION_STORE_PATH = os.getenv("CONVERSATION_STORE_PATH", "conversation_history.sqlite3")
+# How often (seconds) archived conversations idle past SESSION_IDLE_TTL are deleted
+CONVERSATION_PRUNE_INTERVAL = float(os.getenv("CONVERSATION_PRUNE_INTERVAL", "600"))
+
+USER_NOTE_CHARS = 240
+SUMMARY_CHARS = 320
+
+_OUTLINE = re.compile(r"^\s*(#{1,4}\s+.+|[*_]*day\s*\d+.*)$", re.IGNORECASE | re.MULTILINE)
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def summarize_itinerary(text: str, limit: int = SUMMARY_CHARS) -> str:
+    """
+    One-line outline of an itinerary: its headings and day lines, else its opening.
+    """
+    outline = [line.strip(" #*_") for line in _OUTLINE.findall(text)]
+    return _clip("; ".join(outline) if outline else text, limit)
+
+
+def _fit(text: str, tokens: int) -> str:
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[:max(0, tokens * 4 - 16)] + "\n…(truncated)"
+
+
+class HistoryStore:
+    """
+    Archived conversation messages on disk, zlib-compressed, one row per message.
+
+    Conversations nobody has added to for `idle_ttl` seconds are deleted; by then
+    their in-process session has expired too, so nothing can read them again.
+    """
+
+    def __init__(self, path: str = CONVERSATION_STORE_PATH, idle_ttl: float = SESSION_IDLE_TTL,
+                 prune_interval: float = CONVERSATION_PRUNE_INTERVAL):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self.prune_interval = prune_interval
+        self._conn = None
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+
+    def _db(self):
+        # Opened on first spill, so sessions that never overflow don't create the file
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_history ("
+                "session_id TEXT NOT NULL, seq INTEGER NOT NULL, role TEXT NOT NULL, "
+                "content BLOB NOT NULL, stored_at REAL NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (session_id, seq))"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(conversation_history)")}
+            if "stored_at" not in columns:
+                # Files written before rows were timestamped; they count as idle
+                self._conn.execute("ALTER TABLE conversation_history ADD COLUMN stored_at REAL NOT NULL DEFAULT 0")
+            self._conn.commit()
+        return self._conn
+
+    def append(self, session_id: str, seq: int, message: dict):
+        blob = zlib.compress(message["content"].encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO conversation_history (session_id, seq, role, content, stored_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, seq, message["role"], blob, now),
+            )
+            if now - self._pruned_at >= self.prune_interval:
+                self._prune(db, now)
+            db.commit()
+
+    def _prune(self, db, now: float):
+        # Caller holds the lock and commits
+        self._pruned_at = now
+        deleted = db.execute(
+            "DELETE FROM conversation_history WHERE session_id IN ("
+            "SELECT session_id FROM conversation_history GROUP BY session_id HAVING MAX(stored_at) < ?)",
+            (now - self.idle_ttl,),
+        ).rowcount
+        if deleted:
+            logger.info("pruned %d archived messages of idle conversations", deleted)
+
+    def prune(self):
+        """
+        Delete conversations idle for longer than idle_ttl (also done on append every prune_interval).
+        """
+        with self._lock:
+            if self._conn is None and not os.path.exists(self.path):
+                return
+            db = self._db()
+            self._prune(db, time.time())
+            db.commit()
+
+    def load(self, session_id: str, limit: int = None) -> list:
+        """
+        Archived messages, oldest first (the newest `limit` when given).
+        """
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT role, content FROM conversation_history WHERE session_id = ? "
+                "ORDER BY seq DESC LIMIT ?",
+                (session_id, -1 if limit is None else limit),
+            ).fetchall()
+        return [{"role": role, "content": zlib.decompress(blob).decode("utf-8")} for role, blob in reversed(rows)]
+
+    def drop(self, session_id: str):
+        with self._lock:
+            if self._conn is None and not os.path.exists(self.path):
+                return
+            db = self._db()
+            db.execute("DELETE FROM conversation_history WHERE session_id = ?", (session_id,))
+            db.commit()
+
+
+history_store = HistoryStore()
+
+
+class ConversationMemory:
+    """
+    Chat history for one conversation with bounded RAM and bounded prompts.
+
+    The last `ram_messages` messages stay in memory for display; older ones
+    move to the HistoryStore and are remembered only as one-line notes.
+    The latest itinerary is kept verbatim unless it alone overflows the budget
+    (then it is truncated and a warning is logged). build_prompt() fits the latest
+    itinerary, the new request and as many recent notes as the budget allows.
+    """
+
+    def __init__(self, session_id: str, store: HistoryStore = history_store,
+                 budget: int = MEMORY_TOKEN_BUDGET, ram_messages: int = MEMORY_RAM_MESSAGES):
+        self.session_id = session_id
+        self.store = store
+        self.budget = budget
+        self.ram_messages = ram_messages
+        self.messages = []
+        self.latest_itinerary = None
+        self.archived = 0
+        self._notes = []  # compact lines for archived messages, newest last
+
+    @staticmethod
+    def _note(message: dict) -> str:
+        if message["role"] == "user":
+            return f"User asked: {_clip(message['content'], USER_NOTE_CHARS)}"
+        return f"Earlier itinerary: {summarize_itinerary(message['content'])}"
+
+    def add(self, role: str, content: str):
+        self.messages.append({"role": role, "content": content})
+        if role == "assistant":
+            self.latest_itinerary = content
+        while len(self.messages) > self.ram_messages:
+            message = self.messages.pop(0)
+            self.store.append(self.session_id, self.archived, message)
+            self.archived += 1
+            self._notes.append(self._note(message))
+        # Notes beyond the budget would never make it into a prompt
+        while self._notes and estimate_tokens("\n".join(self._notes)) > self.budget:
+            self._notes.pop(0)
+
+    def archived_messages(self, limit: int = None) -> list:
+        return self.store.load(self.session_id, limit) if self.archived else []
+
+    def build_prompt(self, request: str) -> str:
+        """
+        Refinement prompt: latest itinerary verbatim, then earlier turns (user
+        requests kept, older itineraries summarised, newest first until the
+        budget runs out), then the new request.
+        """
+        remaining = self.budget - estimate_tokens(request) - 40
+        latest = ""
+        if self.latest_itinerary:
+            latest = _fit(self.latest_itinerary, max(remaining, 0))
+            if latest is not self.latest_itinerary:
+                logger.warning(
+                    "latest itinerary (~%d tokens) truncated to %d tokens to fit MEMORY_TOKEN_BUDGET=%d; "
+                    "the refinement will not see its end", estimate_tokens(self.latest_itinerary),
+                    max(remaining, 0), self.budget,
+                )
+            remaining -= estimate_tokens(latest)
+
+        recent = [m for m in self.messages if m["content"] is not self.latest_itinerary]
+        candidates = self._notes + [self._note(m) for m in recent]
+        earlier = []
+        for note in reversed(candidates):
+            cost = estimate_tokens(note) + 1
+            if cost > remaining:
+                break
+            earlier.append(note)
+            remaining -= cost
+        earlier.reverse()
+
+        parts = []
+        if latest:
+            parts.append(f"Latest itinerary (revise this):\n{latest}")
+        if earlier:
+            parts.append("Earlier in this conversation:\n" + "\n".join(f"- {n}" for n in earlier))
+        parts.append(f"New request: {request}")
+        return "\n\n".join(parts)
+
+    def clear(self):
+        self.store.drop(self.session_id)
+        self.messages = []
+        self.latest_itinerary = None
+        self.archived = 0
+        self._notes = []
+
+    def stats(self) -> dict:
+        return {
+            "messages_in_memory": len(self.messages),
+            "archived": self.archived,
+            "ram_chars": sum(len(m["content"]) for m in self.messages) + len(self.latest_itinerary or ""),
+        }
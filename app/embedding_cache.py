@@ -0,0 +1,131 @@
+import os
+import atexit
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "10000"))
+# Optional .npz file; when set the cache is loaded on start and saved at exit
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU of embeddings keyed by (model name, sha1 of text), stored as float32.
+    """
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE, path: str = EMBEDDING_CACHE_PATH):
+        self.max_entries = max_entries
+        self.path = path
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        if path and os.path.exists(path):
+            self.load(path)
+
+    @staticmethod
+    def _key(model: str, text: str):
+        return model, hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str):
+        key = self._key(model, text)
+        with self._lock:
+            vector = self._data.get(key)
+            if vector is None:
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return vector
+
+    def put(self, model: str, text: str, vector):
+        key = self._key(model, text)
+        with self._lock:
+            self._data[key] = np.asarray(vector, dtype=np.float32)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._data),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+            }
+
+    def save(self, path: str = None):
+        """
+        Write one float32 matrix (plus its key hashes) per model into an .npz file.
+        """
+        path = path or self.path
+        if not path:
+            return
+        with self._lock:
+            by_model = {}
+            for (model, digest), vector in self._data.items():
+                by_model.setdefault(model, ([], []))
+                by_model[model][0].append(digest)
+                by_model[model][1].append(vector)
+        arrays = {"models": np.array(list(by_model), dtype=str)}
+        for i, (digests, vectors) in enumerate(by_model.values()):
+            arrays[f"keys_{i}"] = np.array(digests, dtype=str)
+            arrays[f"vectors_{i}"] = np.vstack(vectors).astype(np.float32)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        with np.load(path, allow_pickle=False) as archive:
+            models = list(archive["models"])
+            with self._lock:
+                for i, model in enumerate(models):
+                    for digest, vector in zip(archive[f"keys_{i}"], archive[f"vectors_{i}"]):
+                        self._data[(str(model), str(digest))] = vector
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+
+
+class CachedEmbeddings:
+    """
+    Wraps an embeddings object (embed_documents / embed_query) and only sends
+    texts that aren't already cached to it.
+    """
+
+    def __init__(self, inner, model_name: str, cache: EmbeddingCache):
+        self.inner = inner
+        self.model_name = model_name
+        self.cache = cache
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = [self.cache.get(self.model_name, t) for t in texts]
+        missing = list(dict.fromkeys(t for t, v in zip(texts, vectors) if v is None))
+        if missing:
+            # EmbeddingBackend.encode already returns float32 arrays; skip the list round-trip
+            encode = getattr(self.inner, "encode", None)
+            computed = encode(missing) if encode else self.inner.embed_documents(missing)
+            fresh = dict(zip(missing, computed))
+            for text, vector in fresh.items():
+                self.cache.put(self.model_name, text, vector)
+            vectors = [v if v is not None else np.asarray(fresh[t], dtype=np.float32) for t, v in zip(texts, vectors)]
+        return [v.tolist() for v in vectors]
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = self.cache.get(self.model_name, text)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self.cache.put(self.model_name, text, vector)
+            return list(vector)
+        return vector.tolist()
+
+
+embedding_cache = EmbeddingCache()
+atexit.register(embedding_cache.save)
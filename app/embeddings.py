@@ -0,0 +1,125 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# "gemini" (remote) or "local" (SentenceTransformers on CPU)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "gemini")
+GEMINI_EMBEDDING_MODEL = "models/embedding-001"
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", str(os.cpu_count() or 1)))
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+
+
+class EmbeddingBackend(ABC):
+    """
+    Base interface. Backends implement encode() -> float32 array of shape (n, dim);
+    embed_documents / embed_query adapt that to the list-based API Chroma expects.
+    """
+
+    name = "base"
+    model_name = ""
+
+    @abstractmethod
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """
+        Float32 array of shape (len(texts), dim).
+        """
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.encode([text])[0].tolist()
+
+
+class GeminiBackend(EmbeddingBackend):
+    """
+    Remote Gemini embeddings (one network round-trip per batch).
+    """
+
+    name = "gemini"
+    # embed_content accepts at most 100 inputs per request
+    MAX_BATCH = 100
+
+    def __init__(self, model_name: str = GEMINI_EMBEDDING_MODEL):
+        self.model_name = model_name
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from google import genai
+                    self._client = genai.Client(api_key=GEMINI_API_KEY)
+        return self._client
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        vectors = []
+        for i in range(0, len(texts), self.MAX_BATCH):
+            response = self.client.models.embed_content(
+                model=self.model_name,
+                contents=texts[i:i + self.MAX_BATCH]
+            )
+            vectors.extend(item.values for item in response.embeddings)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class LocalBackend(EmbeddingBackend):
+    """
+    SentenceTransformers on CPU: no network, works in air-gapped batch jobs.
+    The model is loaded on first use.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        model_name: str = LOCAL_EMBEDDING_MODEL,
+        threads: int = LOCAL_EMBEDDING_THREADS,
+        batch_size: int = LOCAL_EMBEDDING_BATCH_SIZE,
+    ):
+        self.model_name = model_name
+        self.threads = threads
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import torch
+                    from sentence_transformers import SentenceTransformer
+                    torch.set_num_threads(self.threads)
+                    self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        ).astype(np.float32, copy=False)
+
+
+BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+
+def get_backend(name: str = EMBEDDING_BACKEND) -> EmbeddingBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {name!r}; expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name]()
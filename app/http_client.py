@@ -0,0 +1,245 @@
+import os
+import time
+import asyncio
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+import metrics
+import resilience
+
+load_dotenv()
+
+# Pool / timeout settings (seconds)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+
+def _decode(response):
+    """
+    Return the JSON body, or an empty dict when the upstream sent something else.
+    """
+    try:
+        return response.json()
+    except ValueError:
+        return {}
+
+
+def _record(endpoint: str, started: float, status) -> float:
+    """
+    Per-endpoint latency histogram and status counter; returns the latency.
+    """
+    latency = time.perf_counter() - started
+    metrics.observe("upstream_request_seconds", latency, endpoint=endpoint)
+    metrics.inc("upstream_requests_total", endpoint=endpoint, status=str(status))
+    return latency
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# Each attempt goes through the provider's breaker and rate limiter (see resilience);
+# 5xx/429 and transport errors count as failures and GETs are retried with jittered backoff.
+# The final attempt's response is returned as before, or its transport error raised.
+
+
+#  SYNC (shared keep-alive session)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    One requests.Session per process so sync callers reuse TCP+TLS connections.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_MAX_CONNECTIONS // HTTP_MAX_CONNECTIONS_PER_HOST or 1,
+                    pool_maxsize=HTTP_MAX_CONNECTIONS_PER_HOST,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def request_json(method: str, url: str, params=None, headers=None, data=None, timeout=None, endpoint=None):
+    """
+    Blocking request through the shared session.
+    Returns (status_code, json_body); raises resilience.UpstreamUnavailable
+    when the provider's breaker is open or its quota is exhausted.
+    """
+    endpoint = endpoint or urlsplit(url).netloc
+    provider = resilience.provider_for(endpoint)
+    attempts = 1 + (resilience.RETRY_ATTEMPTS if method == "GET" else 0)
+    for attempt in range(attempts):
+        provider.before_call()
+        started, response, error = time.perf_counter(), None, None
+        try:
+            response = get_session().request(
+                method, url,
+                params=params,
+                headers=headers,
+                data=data,
+                timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+            )
+        except requests.RequestException as e:
+            error = e
+        except BaseException:
+            provider.release()
+            raise
+        latency = _record(endpoint, started, "error" if response is None else response.status_code)
+        ok = error is None and response.status_code not in resilience.RETRYABLE_STATUS
+        provider.record(ok, latency)
+        if ok or attempt + 1 == attempts:
+            break
+        time.sleep(provider.backoff(attempt, _retry_after(response)))
+    if error is not None:
+        raise error
+    return response.status_code, _decode(response)
+
+
+def get_json(url: str, params=None, headers=None, timeout=None, endpoint=None):
+    return request_json("GET", url, params=params, headers=headers, timeout=timeout, endpoint=endpoint)
+
+
+#  ASYNC (shared httpx pool)
+
+_async_clients = {}
+_host_limits = {}
+_async_lock = threading.Lock()
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Shared AsyncClient for the running event loop.
+    httpx pools are bound to the loop that created them, so we keep one per loop;
+    in practice everything runs on the background loop from get_loop().
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        with _async_lock:
+            client = _async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                    ),
+                    timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                )
+                _async_clients[loop] = client
+    return client
+
+
+def _host_semaphore(url: str) -> asyncio.Semaphore:
+    """
+    httpx only limits the pool as a whole, so per-host limits are a semaphore per (loop, host).
+    """
+    key = (asyncio.get_running_loop(), urlsplit(url).netloc)
+    sem = _host_limits.get(key)
+    if sem is None:
+        with _async_lock:
+            sem = _host_limits.setdefault(key, asyncio.Semaphore(HTTP_MAX_CONNECTIONS_PER_HOST))
+    return sem
+
+
+async def arequest_json(method: str, url: str, params=None, headers=None, data=None, timeout=None, endpoint=None):
+    """
+    Async request through the shared pool.
+    Returns (status_code, json_body); raises resilience.UpstreamUnavailable
+    when the provider's breaker is open or its quota is exhausted.
+    """
+    endpoint = endpoint or urlsplit(url).netloc
+    provider = resilience.provider_for(endpoint)
+    client = get_async_client()
+    attempts = 1 + (resilience.RETRY_ATTEMPTS if method == "GET" else 0)
+    for attempt in range(attempts):
+        await provider.abefore_call()
+        try:
+            async with _host_semaphore(url):
+                # timed inside the semaphore so pool queueing isn't counted as upstream latency
+                started, response, error = time.perf_counter(), None, None
+                try:
+                    response = await client.request(
+                        method, url,
+                        params=params,
+                        headers=headers,
+                        data=data,
+                        timeout=timeout or httpx.USE_CLIENT_DEFAULT,
+                    )
+                except httpx.HTTPError as e:
+                    error = e
+        except BaseException:
+            # cancelled (e.g. agent budget) before an outcome: don't count it either way
+            provider.release()
+            raise
+        latency = _record(endpoint, started, "error" if response is None else response.status_code)
+        ok = error is None and response.status_code not in resilience.RETRYABLE_STATUS
+        provider.record(ok, latency)
+        if ok or attempt + 1 == attempts:
+            break
+        await asyncio.sleep(provider.backoff(attempt, _retry_after(response)))
+    if error is not None:
+        raise error
+    return response.status_code, _decode(response)
+
+
+async def aget_json(url: str, params=None, headers=None, timeout=None, endpoint=None):
+    return await arequest_json("GET", url, params=params, headers=headers, timeout=timeout, endpoint=endpoint)
+
+
+async def aclose():
+    """
+    Close the pool owned by the running loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        client = _async_clients.pop(loop, None)
+        for key in [k for k in _host_limits if k[0] is loop]:
+            del _host_limits[key]
+    if client is not None:
+        await client.aclose()
+
+
+#  BACKGROUND LOOP (lets sync code drive async agents on one shared pool)
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="http-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def run_sync(coro, timeout=None):
+    """
+    Run a coroutine on the shared background loop and block for its result.
+    Safe to call from any thread except the loop thread itself.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
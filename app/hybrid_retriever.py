@@ -0,0 +1,198 @@
+import re
+import math
+import time
+import hashlib
+import threading
+from collections import Counter, defaultdict
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+# Reciprocal rank fusion constant (standard value from the RRF paper)
+RRF_K = 60
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Index:
+    """
+    In-process inverted index with Okapi BM25 scoring.
+    """
+
+    def __init__(self, ids: list[str], texts: list[str], k1: float = 1.5, b: float = 0.75):
+        self.ids = ids
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)  # term -> [(doc_index, term_frequency)]
+        self.doc_len = []
+        for i, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            self.doc_len.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings[term].append((i, tf))
+        n = len(ids)
+        self.avg_len = (sum(self.doc_len) / n) if n else 0.0
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def docs_containing(self, terms: list[str]) -> set[int]:
+        """
+        Indices of documents that contain every term.
+        """
+        result = None
+        for term in terms:
+            docs = {i for i, _ in self.postings.get(term, ())}
+            result = docs if result is None else result & docs
+        return result or set()
+
+    def search(self, query: str, k: int, candidates: set[int] = None) -> list[int]:
+        """
+        Top-k document indices, optionally restricted to `candidates`.
+        Only postings of the query terms are touched.
+        """
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                if candidates is not None and i not in candidates:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[i] / self.avg_len)
+                scores[i] += idf * tf * (self.k1 + 1) / norm
+        return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+def reciprocal_rank_fusion(rankings: list[list[str]], k: int = RRF_K) -> list[str]:
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever:
+    """
+    BM25 + vector search over one Chroma collection, fused with RRF.
+
+    A destination/source filter is resolved to a candidate set first, so both the
+    keyword and the vector side only score matching chunks. Destinations are matched
+    against the chunk metadata written by ingest.py and, failing that, against chunks
+    that mention the destination by name.
+    """
+
+    FILTER_FIELDS = ("destination", "source")
+    # How often the collection's contents are re-checked for changes made by another process
+    CHECK_INTERVAL = 5.0
+
+    def __init__(self, store, embeddings):
+        self.store = store
+        self.embeddings = embeddings
+        self._lock = threading.Lock()
+        self._index = None
+        self._texts = []
+        self._by_field = {}
+        self._position = {}
+        self._count = 0
+        self._version = None
+        self._checked_at = 0.0
+
+    @property
+    def collection(self):
+        return self.store._collection
+
+    def _content_version(self) -> str:
+        # Chunk IDs hash the chunk text (ingest.py), so the ID set changes whenever
+        # any chunk is added, removed or replaced, even if the count stays the same
+        ids = sorted(self.collection.get(include=[])["ids"])
+        return hashlib.sha1("\0".join(ids).encode("utf-8")).hexdigest()
+
+    def invalidate(self):
+        """
+        Force a rebuild on the next search (called after an in-process ingest).
+        """
+        self._checked_at = 0.0
+        self._version = None
+
+    def _ensure_index(self):
+        # Rebuild when ingestion changed the collection
+        now = time.monotonic()
+        if self._index is not None and now - self._checked_at < self.CHECK_INTERVAL:
+            return
+        with self._lock:
+            if self._index is not None and now - self._checked_at < self.CHECK_INTERVAL:
+                return
+            version = self._content_version()
+            self._checked_at = now
+            if self._index is not None and version == self._version:
+                return
+            data = self.collection.get(include=["documents", "metadatas"])
+            self._texts = data["documents"]
+            by_field = defaultdict(set)
+            for i, meta in enumerate(data["metadatas"]):
+                for field in self.FILTER_FIELDS:
+                    if meta and field in meta:
+                        by_field[(field, meta[field])].add(i)
+            self._by_field = by_field
+            self._index = BM25Index(data["ids"], self._texts)
+            self._position = {doc_id: i for i, doc_id in enumerate(data["ids"])}
+            self._count = len(data["ids"])
+            self._version = version
+
+    def _candidates(self, destination: str = None, source: str = None):
+        """
+        Returns (candidate doc indices or None for "no filter", chroma where clause or None).
+        """
+        if not destination and not source:
+            return None, None
+        clauses = []
+        if destination:
+            clauses.append({"destination": destination.strip().lower()})
+        if source:
+            clauses.append({"source": source})
+        where = clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+        matched = None
+        for clause in clauses:
+            (field, value), = clause.items()
+            docs = self._by_field.get((field, value), set())
+            matched = docs if matched is None else matched & docs
+        if matched:
+            return matched, where
+        if destination:
+            mentioned = self._index.docs_containing(tokenize(destination))
+            if mentioned:
+                return mentioned, None
+        return None, None
+
+    def _vector_ranking(self, query: str, fetch_k: int, candidates, where) -> list[str]:
+        if candidates is not None and where is None:
+            # Candidates came from text matches; over-fetch then keep only those
+            fetch_k = min(self._count, fetch_k * 4)
+        result = self.collection.query(
+            query_embeddings=[self.embeddings.embed_query(query)],
+            n_results=max(1, min(fetch_k, len(candidates) if where is not None else self._count)),
+            where=where,
+            include=[],
+        )
+        ids = result["ids"][0]
+        if candidates is not None and where is None:
+            allowed = {self._index.ids[i] for i in candidates}
+            ids = [doc_id for doc_id in ids if doc_id in allowed]
+        return ids
+
+    def search(self, query: str, k: int = 5, destination: str = None, source: str = None, fetch_k: int = 20) -> list[str]:
+        """
+        Returns the text of the top-k fused chunks.
+        """
+        self._ensure_index()
+        if not self._count:
+            return []
+        candidates, where = self._candidates(destination, source)
+        keyword = [self._index.ids[i] for i in self._index.search(query, fetch_k, candidates)]
+        vector = self._vector_ranking(query, fetch_k, candidates, where)
+        fused = reciprocal_rank_fusion([keyword, vector])[:k]
+        return [self._texts[self._position[doc_id]] for doc_id in fused if doc_id in self._position]
@@ -0,0 +1,233 @@
+"""
+Incremental ingestion of data/travel_blogs into Chroma.
+
+Files are split into overlapping chunks whose IDs are derived from the source
+path and chunk content, so re-running only embeds new or edited chunks and
+removes the chunks an edited file no longer produces.
+
+    python ingest.py --data-path ../data/travel_blogs --workers 4
+"""
+import os
+import glob
+import time
+import random
+import hashlib
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from rag import get_vectorstore, get_embeddings, PERSIST_DIR, COLLECTION_NAME
+
+DATA_PATH = "data/travel_blogs"
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 150
+BATCH_SIZE = 64
+MAX_BATCH_CHARS = 40000
+WORKERS = 4
+MAX_RETRIES = 5
+
+
+class Chunk(NamedTuple):
+    id: str
+    text: str
+    metadata: dict
+
+
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP) -> list[str]:
+    """
+    Split text into ~chunk_size character windows that overlap by `overlap`,
+    preferring to cut at paragraph, line, sentence or word boundaries.
+    """
+    text = text.strip()
+    chunks = []
+    start, n = 0, len(text)
+    while start < n:
+        end = min(start + chunk_size, n)
+        if end < n:
+            for sep in ("\n\n", "\n", ". ", " "):
+                cut = text.rfind(sep, start + chunk_size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        piece = text[start:end].strip()
+        if piece:
+            chunks.append(piece)
+        if end >= n:
+            break
+        next_start = max(end - overlap, start + 1)
+        # begin the overlap on a word boundary
+        while next_start < end and not text[next_start - 1].isspace():
+            next_start += 1
+        start = next_start if next_start < end else max(end - overlap, start + 1)
+    return chunks
+
+
+def source_name(path: str, data_path: str) -> str:
+    """
+    Path relative to the data directory, so the same corpus gets the same chunk IDs
+    whether ingestion runs as `--data-path data/travel_blogs` or `../data/travel_blogs`.
+    """
+    return os.path.relpath(path, data_path).replace(os.sep, "/")
+
+
+def chunk_file(path: str, chunk_size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP, source: str = None) -> list[Chunk]:
+    source = source or path
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    destination = os.path.splitext(os.path.basename(path))[0].lower()
+    chunks, seen = [], set()
+    for i, piece in enumerate(chunk_text(text, chunk_size, overlap)):
+        digest = hashlib.sha256(piece.encode("utf-8")).hexdigest()
+        chunk_id = hashlib.sha1(f"{source}\0{digest}".encode("utf-8")).hexdigest()
+        if chunk_id in seen:
+            continue
+        seen.add(chunk_id)
+        chunks.append(Chunk(chunk_id, piece, {
+            "source": source,
+            "destination": destination,
+            "chunk": i,
+            "content_hash": digest,
+        }))
+    return chunks
+
+
+def _embed_with_backoff(embeddings, chunks: list[Chunk], retries: int = MAX_RETRIES):
+    for attempt in range(retries + 1):
+        try:
+            return chunks, embeddings.embed_documents([c.text for c in chunks])
+        except Exception:
+            if attempt == retries:
+                raise
+            time.sleep(min(30.0, 2 ** attempt) + random.uniform(0, 1))
+
+
+def _batches(chunks, batch_size: int, max_chars: int):
+    batch, size = [], 0
+    for chunk in chunks:
+        if batch and (len(batch) >= batch_size or size + len(chunk.text) > max_chars):
+            yield batch
+            batch, size = [], 0
+        batch.append(chunk)
+        size += len(chunk.text)
+    if batch:
+        yield batch
+
+
+def run_ingestion(
+    data_path: str = DATA_PATH,
+    chunk_size: int = CHUNK_SIZE,
+    overlap: int = CHUNK_OVERLAP,
+    batch_size: int = BATCH_SIZE,
+    max_batch_chars: int = MAX_BATCH_CHARS,
+    workers: int = WORKERS,
+    prune_missing: bool = False,
+    persist_dir: str = PERSIST_DIR,
+    collection_name: str = COLLECTION_NAME,
+) -> dict:
+    """
+    Stream files -> chunks -> batched parallel embedding -> upsert.
+    Returns counters plus elapsed time and chunks/sec.
+    """
+    collection = get_vectorstore(persist_dir, collection_name)._collection
+    embeddings = get_embeddings()
+    stats = {"files": 0, "chunks": 0, "embedded": 0, "skipped": 0, "deleted": 0}
+    sources = set()
+    # IDs replaced by this run; deleted only once the new chunks are stored, so a
+    # failed embedding leaves the old version searchable rather than nothing
+    retired = []
+    started = time.perf_counter()
+
+    def upsert(future):
+        chunks, vectors = future.result()
+        collection.upsert(
+            ids=[c.id for c in chunks],
+            embeddings=vectors,
+            documents=[c.text for c in chunks],
+            metadatas=[c.metadata for c in chunks],
+        )
+        stats["embedded"] += len(chunks)
+
+    def new_chunks():
+        for path in sorted(glob.iglob(os.path.join(data_path, "**", "*.txt"), recursive=True)):
+            source = source_name(path, data_path)
+            chunks = chunk_file(path, chunk_size, overlap, source)
+            sources.add(source)
+            stats["files"] += 1
+            stats["chunks"] += len(chunks)
+
+            # Docs keyed by the raw path (TextLoader's whole files, or chunks from
+            # before sources were relative) are replaced by the relative-path chunks
+            legacy = collection.get(where={"source": path}, include=[])["ids"] if path != source else []
+            retired.extend(legacy)
+
+            existing = set(collection.get(where={"source": source}, include=[])["ids"])
+            retired.extend(existing - {c.id for c in chunks})
+            for chunk in chunks:
+                if chunk.id in existing:
+                    stats["skipped"] += 1
+                else:
+                    yield chunk
+
+    # Keep at most 2 batches per worker in flight so memory stays flat on big corpora
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in _batches(new_chunks(), batch_size, max_batch_chars):
+            pending.append(pool.submit(_embed_with_backoff, embeddings, batch))
+            if len(pending) >= workers * 2:
+                upsert(pending.popleft())
+        while pending:
+            upsert(pending.popleft())
+
+    if retired:
+        collection.delete(ids=retired)
+        stats["deleted"] += len(retired)
+
+    if prune_missing:
+        indexed = collection.get(include=["metadatas"])
+        orphans = [
+            doc_id for doc_id, meta in zip(indexed["ids"], indexed["metadatas"])
+            if (meta or {}).get("source") not in sources
+        ]
+        if orphans:
+            collection.delete(ids=orphans)
+            stats["deleted"] += len(orphans)
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["chunks_per_sec"] = stats["chunks"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally ingest travel blogs into ChromaDB")
+    parser.add_argument("--data-path", default=DATA_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--overlap", type=int, default=CHUNK_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-batch-chars", type=int, default=MAX_BATCH_CHARS)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--prune-missing", action="store_true", help="also drop chunks of deleted files")
+    parser.add_argument("--persist-dir", default=PERSIST_DIR)
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    args = parser.parse_args()
+
+    stats = run_ingestion(
+        data_path=args.data_path,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        batch_size=args.batch_size,
+        max_batch_chars=args.max_batch_chars,
+        workers=args.workers,
+        prune_missing=args.prune_missing,
+        persist_dir=args.persist_dir,
+        collection_name=args.collection,
+    )
+    print(
+        f"{stats['files']} files, {stats['chunks']} chunks "
+        f"({stats['embedded']} embedded, {stats['skipped']} unchanged, {stats['deleted']} deleted) "
+        f"in {stats['seconds']:.2f}s -> {stats['chunks_per_sec']:.1f} chunks/sec"
+    )
+
+
+if __name__ == "__main__":
+    main()
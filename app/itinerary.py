@@ -1,48 +1,52 @@
 import os
+import json
+import time
+import queue
+import hashlib
+import asyncio
+import logging
+import operator
+import functools
+import threading
 from dotenv import load_dotenv
-from google import genai
-from typing import TypedDict, List, Any, Generator
+from typing import TypedDict, List, Any, Generator, Annotated
 
 
 from api_wrappers import (
-    get_weather, search_places, get_exchange_rate,
-    search_flights, search_hotels,
-    search_google_places,
-    get_country_info, get_destination_photo
+    aget_weather, asearch_places, aget_exchange_rate,
+    asearch_flights, asearch_hotels,
+    asearch_google_places,
+    aget_country_info, aget_destination_photo
 )
+from http_client import run_sync
 from rag import query_documents
-
-
-from langgraph.graph import StateGraph, END
-
-# LangSmith tracing
-from langsmith import traceable
-
-# LangChain 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from prompt_budget import compact_structured_data
+from response_cache import response_cache, replay, is_free_chat, canonical_request
+from api_cache import CACHE_POLICIES, DEFAULT_TTL
+from sessions import sessions
+from itinerary_schema import Itinerary, RESPONSE_SCHEMA
+import metrics
+from metrics import LLMStreamTimer, timed_agent
 
 # CSV usage logger
-from utils_usage import log_usage
+from utils_usage import log_usage, usage_from_response
+
 
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 if not GEMINI_API_KEY:
     raise RuntimeError("GEMINI_API_KEY not set")
 
-# Google GenAI 
-client = genai.Client(api_key=GEMINI_API_KEY)
+# google-genai, LangChain, LangGraph and LangSmith take seconds to import, so
+# they are loaded (and the clients built) on first use rather than at import.
+# Assigning `client` / `free_chat_chain` directly (e.g. to fakes) skips the build.
+client = None
+free_chat_chain = None
+_clients_lock = threading.Lock()
 
-# LLM
-lc_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash",
-    google_api_key=GEMINI_API_KEY,
-    temperature=0.7,
-)
-
-chat_prompt = ChatPromptTemplate.from_template(
-    """You are a professional travel planner.
+CHAT_PROMPT = """You are a professional travel planner.
 
 User Request:
 {user_prompt}
@@ -55,9 +59,79 @@ Generate a helpful, friendly itinerary with:
 - Rough budget cavets 
 
 Return plain text (not JSON)."""
-)
 
-free_chat_chain = chat_prompt | lc_llm
+
+def get_client():
+    """
+    Google GenAI client for the structured pipeline.
+    """
+    global client
+    if client is None:
+        with _clients_lock:
+            if client is None:
+                from google import genai
+                client = genai.Client(api_key=GEMINI_API_KEY)
+    return client
+
+
+def get_free_chat_chain():
+    """
+    LangChain prompt | Gemini chat model for free-chat mode.
+    """
+    global free_chat_chain
+    if free_chat_chain is None:
+        with _clients_lock:
+            if free_chat_chain is None:
+                from langchain_core.prompts import ChatPromptTemplate
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                lc_llm = ChatGoogleGenerativeAI(
+                    model="gemini-2.5-flash",
+                    google_api_key=GEMINI_API_KEY,
+                    temperature=0.7,
+                    timeout=LLM_TIMEOUT,
+                )
+                free_chat_chain = ChatPromptTemplate.from_template(CHAT_PROMPT) | lc_llm
+    return free_chat_chain
+
+
+def traceable(fn):
+    """
+    langsmith.traceable, applied on the first call instead of at import.
+    """
+    traced = None
+
+    def resolve():
+        nonlocal traced
+        if traced is None:
+            from langsmith import traceable as langsmith_traceable
+            traced = langsmith_traceable(fn)
+        return traced
+
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            return await resolve()(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return resolve()(*args, **kwargs)
+    return wrapper
+
+
+def _take_latest(current: Any, update: Any) -> Any:
+    """
+    Reducer for agent-owned sections: agents run in parallel branches, so each
+    section keeps the latest non-empty write instead of raising on concurrent updates.
+    """
+    return current if update is None else update
+
+
+class ItineraryGenerationError(RuntimeError):
+    """
+    Gemini returned no itinerary (blocked or empty response); the message says why.
+    """
 
 
 class TravelState(TypedDict, total=False):
@@ -71,61 +145,79 @@ class TravelState(TypedDict, total=False):
     target_currency: str
     interests: List[str]
     user_prompt: str
-    research: Any
-    weather: Any
-    budget: Any
-    transport: Any
-    accommodation: Any
-    activities: Any
-    country_info: Any
-    media: Any
+    deadline: float
+    reused_agents: List[str]
+    missing_sections: Annotated[List[str], operator.add]
+    research: Annotated[Any, _take_latest]
+    weather: Annotated[Any, _take_latest]
+    budget: Annotated[Any, _take_latest]
+    transport: Annotated[Any, _take_latest]
+    accommodation: Annotated[Any, _take_latest]
+    activities: Annotated[Any, _take_latest]
+    country_info: Annotated[Any, _take_latest]
+    media: Annotated[Any, _take_latest]
     structured_data: Any
+    prompt_context: str
+    prompt_stats: Any
+    usage: Any
     itinerary: Any
+    itinerary_obj: Any
+    llm_error: str
 
 
 
-def research_agent(state: TravelState):
+async def research_agent(state: TravelState):
     dest = state.get("destination")
     if not dest:
-        state["research"] = {"error": "No destination provided"}
-        return state
+        return {"research": {"error": "No destination provided"}}
     query = f"Top attractions and travel info for {dest}"
-    results = search_places("attractions", dest, num_results=5)
-    rag_results = query_documents(query)
-    state["research"] = {"attractions": results, "cultural_notes": rag_results}
-    return state
-
-
-def weather_agent(state: TravelState):
+    # RAG lookup is blocking (Chroma + embedding call), keep it off the event loop
+    results, rag_results = await asyncio.gather(
+        asearch_places("attractions", dest, num_results=5),
+        asyncio.to_thread(query_documents, query, dest),
+        return_exceptions=True,
+    )
+    if isinstance(results, Exception) and isinstance(rag_results, Exception):
+        raise results
+    # Keep whichever half arrived rather than losing the whole section
+    if isinstance(results, Exception):
+        logger.warning("research agent: places lookup failed: %s", results)
+        results = {"error": f"places lookup failed ({results})"}
+    if isinstance(rag_results, Exception):
+        logger.warning("research agent: RAG lookup failed: %s", rag_results)
+        rag_results = []
+    return {"research": {"attractions": results, "cultural_notes": rag_results}}
+
+
+async def weather_agent(state: TravelState):
     dest = state.get("destination")
     days = state.get("days", 3)
     if not dest:
-        state["weather"] = {"error": "No destination provided"}
-        return state
-    state["weather"] = get_weather(dest, days)
-    return state
+        return {"weather": {"error": "No destination provided"}}
+    return {"weather": await aget_weather(dest, days)}
 
 
-def budget_agent(state: TravelState):
+async def budget_agent(state: TravelState):
     base = state.get("budget_currency", "USD")
     target = state.get("target_currency", "USD")
     try:
-        exchange = get_exchange_rate(base, target)
+        exchange = await aget_exchange_rate(base, target)
     except Exception as e:
         exchange = {"error": f"exchange API failed: {e}"}
-    state["budget"] = {
-        "exchange_rate": exchange,
-        "categories": {
-            "flights": "from transport agent",
-            "stay": "from accommodation agent",
-            "food": "avg $20/day",
-            "activities": "variable",
-        },
+    return {
+        "budget": {
+            "exchange_rate": exchange,
+            "categories": {
+                "flights": "from transport agent",
+                "stay": "from accommodation agent",
+                "food": "avg $20/day",
+                "activities": "variable",
+            },
+        }
     }
-    return state
 
 
-def transport_agent(state: TravelState):
+async def transport_agent(state: TravelState):
     DESTINATION_AIRPORTS = {
         "Manali": "IXC",
         "Shimla": "SLV",
@@ -136,75 +228,70 @@ def transport_agent(state: TravelState):
     dest = state.get("destination")
     date = state.get("date", "")
     if not origin or not dest:
-        state["transport"] = {"error": "origin/destination missing"}
-        return state
+        return {"transport": {"error": "origin/destination missing"}}
 
     dest_code = state.get("destination_code") or DESTINATION_AIRPORTS.get(dest, dest)
     flights = {}
     try:
-        flights = search_flights(origin, dest_code, date, adults=1)
+        flights = await asearch_flights(origin, dest_code, date, adults=1)
     except Exception as e:
         flights = {"error": f"flight search failed: {e}"}
 
     if not flights or not flights.get("data"):
-        state["transport"] = {
-            "flights": None,
-            "note": f"No direct flights to {dest}. Suggest road/train from {origin}.",
+        return {
+            "transport": {
+                "flights": None,
+                "note": f"No direct flights to {dest}. Suggest road/train from {origin}.",
+            }
         }
-    else:
-        state["transport"] = {
+    return {
+        "transport": {
             "flights": flights,
             "local_transport": ["cab", "bus", "rental bike"],
         }
-    return state
+    }
 
 
-def accommodation_agent(state: TravelState):
+async def accommodation_agent(state: TravelState):
     city_code = state.get("destination_code") or state.get("destination")
     if not city_code:
-        state["accommodation"] = {"error": "No destination code or city provided"}
-        return state
+        return {"accommodation": {"error": "No destination code or city provided"}}
     try:
-        hotels = search_hotels(city_code)
+        hotels = await asearch_hotels(city_code)
     except Exception as e:
         hotels = {"error": f"hotel search failed: {e}"}
-    state["accommodation"] = hotels
-    return state
+    return {"accommodation": hotels}
 
 
-def activity_agent(state: TravelState):
+async def activity_agent(state: TravelState):
     dest = state.get("destination", "")
     interests = state.get("interests", [])
     query = f"{' and '.join(interests) if interests else 'popular'} activities in {dest}"
     try:
-        activities = search_google_places(query, "0,0")
+        activities = await asearch_google_places(query, "0,0")
     except Exception as e:
         activities = {"error": f"places search failed: {e}"}
-    state["activities"] = activities
-    return state
+    return {"activities": activities}
 
 
-def country_agent(state: TravelState):
+async def country_agent(state: TravelState):
     country = state.get("country")
     if not country:
-        state["country_info"] = {"error": "No country provided"}
-        return state
+        return {"country_info": {"error": "No country provided"}}
     try:
-        info = get_country_info(country)
+        info = await aget_country_info(country)
     except Exception as e:
         info = {"error": f"country info failed: {e}"}
-    state["country_info"] = info
-    return state
+    return {"country_info": info}
 
 
-def media_agent(state: TravelState):
+async def media_agent(state: TravelState):
     dest = state.get("destination", "")
     try:
-        photos = get_destination_photo(dest, count=3)
+        photos = await aget_destination_photo(dest, count=3)
     except Exception as e:
         photos = {"error": f"photo fetch failed: {e}"}
-    state["media"] = photos
-    return state
+    return {"media": photos}
 
 
 def coordinator_agent(state: TravelState):
@@ -218,9 +305,208 @@ def coordinator_agent(state: TravelState):
         "country_info": state.get("country_info"),
         "media": state.get("media"),
     }
-    state["structured_data"] = structured
-    return state
+    missing = sorted(set(state.get("missing_sections") or []))
+    if missing:
+        # Placeholders from agents that missed their budget; the prompt says to work around them
+        structured["missing_sections"] = missing
+        logger.info("coordinator proceeding without: %s", ", ".join(missing))
+    return {"structured_data": structured}
+
+
+def projection_agent(state: TravelState):
+    """
+    Shrink structured_data to what the itinerary prompt needs (see prompt_budget).
+    """
+    context, stats = compact_structured_data(state.get("structured_data"))
+    return {"prompt_context": context, "prompt_stats": stats}
+
+
+# Data agents don't read each other's output, so they all fan out from START
+# and join at the coordinator.
+DATA_AGENTS = {
+    "research": research_agent,
+    "weather": weather_agent,
+    "budget": budget_agent,
+    "transport": transport_agent,
+    "accommodation": accommodation_agent,
+    "activities": activity_agent,
+    "country": country_agent,
+    "media": media_agent,
+}
+# State key each data agent writes
+AGENT_SECTIONS = {name: name for name in DATA_AGENTS}
+AGENT_SECTIONS["country"] = "country_info"
+
+# Seconds: each data agent's own budget (AGENT_TIMEOUT_<NAME> overrides one agent),
+# and the deadline for the whole data-gathering stage of a request
+AGENT_TIMEOUT = float(os.getenv("AGENT_TIMEOUT", "8"))
+AGENT_TIMEOUTS = {
+    name: float(os.getenv(f"AGENT_TIMEOUT_{name.upper()}", AGENT_TIMEOUT)) for name in DATA_AGENTS
+}
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Streams: LLM_TIMEOUT bounds the whole stream, this the wait for any one chunk (incl. the first)
+LLM_STREAM_IDLE_TIMEOUT = float(os.getenv("LLM_STREAM_IDLE_TIMEOUT", "30"))
+
+
+def _budgeted(name: str, agent):
+    """
+    Run a data agent within its budget, capped by the request's deadline.
+    An agent that runs late or raises leaves a placeholder for its section
+    instead of holding up (or failing) the join at the coordinator.
+    """
+    section = AGENT_SECTIONS[name]
+    budget = AGENT_TIMEOUTS[name]
+
+    @functools.wraps(agent)
+    async def run(state: TravelState):
+        timeout = budget
+        if state.get("deadline") is not None:
+            timeout = max(0.0, min(timeout, state["deadline"] - time.monotonic()))
+        try:
+            return await asyncio.wait_for(agent(state), timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("agent_timeouts_total", agent=name)
+            reason = f"no data: {name} agent exceeded its {timeout:.1f}s budget"
+        except Exception as e:
+            metrics.inc("agent_failures_total", agent=name)
+            logger.warning("%s agent failed: %s", name, e)
+            reason = f"no data: {name} agent failed ({e})"
+        return {section: {"error": reason, "missing": True}, "missing_sections": [section]}
+
+    return run
+
+
+def _with_deadline(user_request: dict) -> dict:
+    return {**user_request, "deadline": time.monotonic() + REQUEST_DEADLINE}
+
+
+# Request fields each data agent reads: a refinement in the same session reruns
+# an agent only when one of these changed...
+AGENT_INPUTS = {
+    "research": ("destination",),
+    "weather": ("destination", "days"),
+    "budget": ("budget_currency", "target_currency"),
+    "transport": ("origin", "destination", "destination_code", "date"),
+    "accommodation": ("destination_code", "destination"),
+    "activities": ("destination", "interests"),
+    "country": ("country",),
+    "media": ("destination",),
+}
+# ...or when its section is older than the api_cache TTL of the data behind it
+AGENT_FRESHNESS = {
+    "research": "places",
+    "weather": "weather",
+    "budget": "exchange_rate",
+    "transport": "flights",
+    "accommodation": "hotels",
+    "activities": "google_places",
+    "country": "country_info",
+    "media": "photos",
+}
+
+
+def agent_fingerprint(name: str, canonical: dict) -> str:
+    fields = {field: canonical.get(field) for field in AGENT_INPUTS[name]}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _reusable(section) -> bool:
+    return section is not None and not (isinstance(section, dict) and ("error" in section or "errors" in section))
+
+
+def _session_state(user_request: dict, session_id: str = None):
+    """
+    Initial graph state. With a session id, sections from the session's last run
+    whose agent inputs are unchanged (and still fresh) are carried over and
+    those agents are skipped. Returns (state, fingerprints).
+    """
+    state = _with_deadline(user_request)
+    if not session_id:
+        return state, None
+    canonical = canonical_request(user_request)
+    fingerprints = {name: agent_fingerprint(name, canonical) for name in DATA_AGENTS}
+    previous = sessions.get(session_id, "agents") or {}
+    now = time.time()
+    reused = []
+    for name, fingerprint in fingerprints.items():
+        prev = previous.get(name)
+        if not prev or prev["fingerprint"] != fingerprint:
+            continue
+        if now - prev["fetched_at"] > CACHE_POLICIES.get(AGENT_FRESHNESS[name], DEFAULT_TTL):
+            continue
+        state[AGENT_SECTIONS[name]] = prev["section"]
+        reused.append(name)
+        metrics.inc("agents_reused_total", agent=name)
+    state["reused_agents"] = reused
+    if reused:
+        logger.info("session %s: reusing %s", session_id, ", ".join(reused))
+    return state, fingerprints
+
+
+def _remember_sections(session_id: str, final_state: dict, fingerprints: dict):
+    if not session_id:
+        return
+    previous = sessions.get(session_id, "agents") or {}
+    reused = set(final_state.get("reused_agents") or ())
+    now = time.time()
+    agents = {}
+    for name, fingerprint in fingerprints.items():
+        if name in reused and name in previous:
+            agents[name] = previous[name]
+            continue
+        section = final_state.get(AGENT_SECTIONS[name])
+        if _reusable(section):
+            agents[name] = {"fingerprint": fingerprint, "section": section, "fetched_at": now}
+    sessions.set(session_id, "agents", agents)
+
+
+def _degraded(state: dict) -> bool:
+    """
+    True when a section is a _budgeted placeholder; such results are not cached,
+    or every identical request would get them back for the whole TTL.
+    """
+    if state.get("missing_sections"):
+        return True
+    return any(isinstance(state.get(section), dict) and state[section].get("missing") for section in AGENT_SECTIONS.values())
+
+
+def _route_agents(state: TravelState):
+    """
+    Fan out to the data agents whose section wasn't carried over; straight to
+    the coordinator when every section was.
+    """
+    reused = set(state.get("reused_agents") or ())
+    pending = [name for name in DATA_AGENTS if name not in reused]
+    return pending or ["coordinator"]
+
 
+def _build_graph(with_llm: bool):
+    """
+    Shared topology: data agents fan out from START and join at the coordinator,
+    then the projection stage; the full graph appends the in-graph LLM node.
+    Only agents without a reused section are started (see _route_agents).
+    """
+    from langgraph.graph import StateGraph, START, END
+
+    g = StateGraph(TravelState)
+    g.add_conditional_edges(START, _route_agents, list(DATA_AGENTS) + ["coordinator"])
+    for name, agent in DATA_AGENTS.items():
+        g.add_node(name, timed_agent(name)(_budgeted(name, agent)))
+        # Plain edges rather than a join barrier: a barrier would wait for agents that
+        # were skipped. Started agents share one superstep, so the coordinator still runs once.
+        g.add_edge(name, "coordinator")
+    g.add_node("coordinator", timed_agent("coordinator")(coordinator_agent))
+    g.add_node("projection", timed_agent("projection")(projection_agent))
+    g.add_edge("coordinator", "projection")
+
+    if with_llm:
+        g.add_node("llm", timed_agent("llm")(llm_agent))  # non-stream inside node
+        g.add_edge("projection", "llm")
+        g.add_edge("llm", END)
+    else:
+        g.add_edge("projection", END)
+    return g.compile()
 
 
 def build_prep_graph():
@@ -228,67 +514,43 @@ def build_prep_graph():
     Graph that runs all agents up to the 'coordinator' and ENDS there.
     We'll then stream the itinerary text with Gemini manually.
     """
-    g = StateGraph(TravelState)
-    g.add_node("research", research_agent)
-    g.add_node("weather", weather_agent)
-    g.add_node("budget", budget_agent)
-    g.add_node("transport", transport_agent)
-    g.add_node("accommodation", accommodation_agent)
-    g.add_node("activities", activity_agent)
-    g.add_node("country", country_agent)
-    g.add_node("media", media_agent)
-    g.add_node("coordinator", coordinator_agent)
-
-    g.add_edge("research", "weather")
-    g.add_edge("weather", "budget")
-    g.add_edge("budget", "transport")
-    g.add_edge("transport", "accommodation")
-    g.add_edge("accommodation", "activities")
-    g.add_edge("activities", "country")
-    g.add_edge("country", "media")
-    g.add_edge("media", "coordinator")
-    g.add_edge("coordinator", END)
-
-    g.set_entry_point("research")
-    return g.compile()
+    return _build_graph(with_llm=False)
 
 
 def build_full_graph_with_llm():
     """
     Original full graph (non-stream fallback), where LLM agent is inside the graph.
     """
-    g = StateGraph(TravelState)
+    return _build_graph(with_llm=True)
+
+
+# Compiled graphs hold no per-request state, so each is built once per process
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def _compiled(name: str, build):
+    graph = _graphs.get(name)
+    if graph is None:
+        with _graphs_lock:
+            graph = _graphs.get(name)
+            if graph is None:
+                graph = _graphs[name] = build()
+    return graph
+
+
+def get_prep_graph():
+    return _compiled("prep", build_prep_graph)
 
-    g.add_node("research", research_agent)
-    g.add_node("weather", weather_agent)
-    g.add_node("budget", budget_agent)
-    g.add_node("transport", transport_agent)
-    g.add_node("accommodation", accommodation_agent)
-    g.add_node("activities", activity_agent)
-    g.add_node("country", country_agent)
-    g.add_node("media", media_agent)
-    g.add_node("coordinator", coordinator_agent)
-    g.add_node("llm", llm_agent)  # non-stream inside node
-
-    g.add_edge("research", "weather")
-    g.add_edge("weather", "budget")
-    g.add_edge("budget", "transport")
-    g.add_edge("transport", "accommodation")
-    g.add_edge("accommodation", "activities")
-    g.add_edge("activities", "country")
-    g.add_edge("country", "media")
-    g.add_edge("media", "coordinator")
-    g.add_edge("coordinator", "llm")
-    g.add_edge("llm", END)
-
-    g.set_entry_point("research")
-    return g.compile()
+
+def get_full_graph():
+    return _compiled("full", build_full_graph_with_llm)
 
 
 
 @traceable
-def llm_agent(state: TravelState):
-    structured = state["structured_data"]
+async def llm_agent(state: TravelState):
+    structured = state["prompt_context"]
     days = state.get("days", 3)
     dest = state.get("destination", "")
     user_prompt = state.get("user_prompt", "")
@@ -308,35 +570,111 @@ Rules:
 - Consider user interests: {state.get("interests", [])}.
 - Ensure costs are in {target_currency}.
 - Provide practical weather notes.
-
-Output format:
-{{
-  "day_wise_plan": [
-    {{
-      "day": 1,
-      "morning": "...",
-      "afternoon": "...",
-      "evening": "...",
-      "meals": "...",
-      "est_cost": "..."
-    }}
-  ],
-  "weather_summary": "...",
-  "top_attractions": ["...", "..."],
-  "recommendations": ["...", "..."]
-}}
+- Sections listed in missing_sections could not be fetched in time; give general advice for those instead.
+- Output follows the response schema: one day_wise_plan entry per day, plus
+  weather_summary, top_attractions and recommendations.
 """
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=prompt
+    # Native JSON mode: the response is schema-valid, so no repair/regeneration pass
+    timer = LLMStreamTimer("structured_json")
+    response = await asyncio.wait_for(
+        get_client().aio.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=prompt,
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": RESPONSE_SCHEMA,
+            },
+        ),
+        LLM_TIMEOUT,
     )
-    state["itinerary"] = response.text
-    return state
+    usage = usage_from_response(response)
+    timer.finish(usage["output_tokens"])
+    text = response.text
+    if not text:
+        # Blocked (safety/recitation) or empty responses carry no text at all
+        reason = _empty_response_reason(response)
+        logger.warning("Gemini returned no itinerary for %s: %s", dest, reason)
+        return {
+            "itinerary": json.dumps({"error": f"No itinerary generated: {reason}"}),
+            "itinerary_obj": Itinerary(),
+            "llm_error": reason,
+            "usage": usage,
+        }
+    return {
+        "itinerary": text,
+        "itinerary_obj": Itinerary.from_json(text),
+        "usage": usage,
+    }
+
+
+def _empty_response_reason(response) -> str:
+    feedback = getattr(response, "prompt_feedback", None)
+    if getattr(feedback, "block_reason", None):
+        return f"prompt blocked ({feedback.block_reason})"
+    candidates = getattr(response, "candidates", None) or []
+    if candidates and getattr(candidates[0], "finish_reason", None):
+        return f"finish reason {candidates[0].finish_reason}"
+    return "empty response"
+
+
+
+_STREAM_END = object()
+
+
+class _StreamError:
+    __slots__ = ("error",)
 
+    def __init__(self, error: BaseException):
+        self.error = error
 
 
-def _stream_structured_itinerary(structured: Any, days: int, dest: str, user_prompt: str, target_currency: str) -> Generator[str, None, str]:
-    """Stream only the itinerary generation text (after graph prepared the data)."""
+def _bounded_stream(open_stream, mode: str, timeout: float = LLM_TIMEOUT, idle: float = LLM_STREAM_IDLE_TIMEOUT):
+    """
+    Iterate a blocking LLM stream with a total deadline and a maximum gap between
+    chunks. The stream is opened and pulled on a helper thread, so a stalled
+    connection can't hold the caller (a Streamlit run or an SSE response) past the deadline.
+    """
+    chunks = queue.Queue()
+    stop = threading.Event()
+
+    def pump():
+        try:
+            for chunk in open_stream():
+                if stop.is_set():
+                    return
+                chunks.put(chunk)
+            chunks.put(_STREAM_END)
+        except BaseException as e:
+            chunks.put(_StreamError(e))
+
+    threading.Thread(target=pump, name="llm-stream", daemon=True).start()
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    raise queue.Empty
+                item = chunks.get(timeout=min(idle, remaining))
+            except queue.Empty:
+                metrics.inc("llm_timeouts_total", mode=mode)
+                if remaining <= idle:
+                    raise TimeoutError(f"LLM stream did not finish within {timeout:g}s")
+                raise TimeoutError(f"no LLM stream chunk for {idle:g}s")
+            if item is _STREAM_END:
+                return
+            if isinstance(item, _StreamError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()  # the helper drops whatever arrives after we stop listening
+
+
+def _stream_structured_itinerary(structured: Any, days: int, dest: str, user_prompt: str, target_currency: str, usage: dict = None) -> Generator[str, None, str]:
+    """Stream only the itinerary generation text (after graph prepared the data).
+    If `usage` is given it is filled with the token usage reported by the stream."""
+    if not isinstance(structured, str):
+        structured, _ = compact_structured_data(structured)
     prompt = f"""
 You are an intelligent travel planner. Using the structured data below, generate a complete {days}-day itinerary for {dest}.
 
@@ -349,84 +687,149 @@ Guidelines:
 - Day-wise detailed plan (morning/afternoon/evening), food spots, transport notes
 - A short weather summary and practical tips
 - Rough budget remarks in {target_currency}
+- Sections listed in missing_sections could not be fetched in time; give general advice for those instead
 
 Return clear Markdown (NOT JSON).
 """
     collected = ""
-    stream = client.models.generate_content_stream(
-        model="gemini-2.5-flash",
-        contents=prompt
+    usage = {} if usage is None else usage
+    timer = LLMStreamTimer("structured_stream")
+    stream = _bounded_stream(
+        lambda: get_client().models.generate_content_stream(model="gemini-2.5-flash", contents=prompt),
+        "structured_stream",
     )
     for chunk in stream:
         if hasattr(chunk, "text") and chunk.text:
+            timer.first_token()
             collected += chunk.text
             yield chunk.text
+        # usage_metadata on stream chunks is cumulative; the last one wins
+        if getattr(chunk, "usage_metadata", None):
+            usage.update(usage_from_response(chunk))
+    timer.finish(usage.get("output_tokens", 0))
     return collected
 
 
 
 @traceable
-def generate_itinerary(user_request: dict) -> str:
+def generate_itinerary(user_request: dict, session_id: str = None) -> str:
     """
     Non-stream fallback for places where you want a single string result.
+    `session_id` lets follow-up requests reuse unchanged agent data (structured mode).
+    Raises ItineraryGenerationError when Gemini returns no itinerary.
     """
     
-    if "user_prompt" in user_request and len(user_request.keys()) <= 2:
-        result = free_chat_chain.invoke({"user_prompt": user_request["user_prompt"]})
+    if is_free_chat(user_request):
+        cached = response_cache.get(user_request, "text")
+        if cached is not None:
+            return cached
+        timer = LLMStreamTimer("free_chat")
+        result = get_free_chat_chain().invoke({"user_prompt": user_request["user_prompt"]})
+        usage = usage_from_response(result)
+        timer.finish(usage["output_tokens"])
         try:
-            log_usage("free_chat")
+            log_usage("free_chat", usage)
         except Exception:
             pass
+        response_cache.put(user_request, result.content, "text")
         return result.content
 
+    cached = response_cache.get(user_request, "json")
+    if cached is not None:
+        return cached
+
     
-    workflow = build_full_graph_with_llm()
-    final_state = workflow.invoke({**user_request})
+    workflow = get_full_graph()
+    state, fingerprints = _session_state(user_request, session_id)
+    final_state = run_sync(workflow.ainvoke(state))
+    _remember_sections(session_id, final_state, fingerprints)
     text = final_state.get("itinerary", "")
+    prompt_stats = final_state.get("prompt_stats") or {}
+    logger.info("prompt context: %s tokens (saved %s)", prompt_stats.get("compact_tokens"), prompt_stats.get("saved_tokens"))
     try:
-        log_usage("structured")
+        log_usage("structured", final_state.get("usage"))
     except Exception:
         pass
+    if final_state.get("llm_error"):
+        raise ItineraryGenerationError(f"No itinerary generated: {final_state['llm_error']}")
+    if not _degraded(final_state):
+        response_cache.put(user_request, text, "json")
     return text
 
 
-def generate_itinerary_stream(user_request: dict) -> Generator[str, None, str]:
+def generate_itinerary_structured(user_request: dict, session_id: str = None) -> Itinerary:
+    """
+    Structured requests as a typed Itinerary (for PDF export and other consumers
+    that want fields rather than text).
+    """
+    return Itinerary.from_json(generate_itinerary(user_request, session_id))
+
+
+def generate_itinerary_stream(user_request: dict, session_id: str = None) -> Generator[str, None, str]:
     """
     Streaming version for BOTH modes.
     Yields chunks of text; returns full string at the end.
+    With a `session_id`, a structured refinement only reruns the agents whose
+    inputs changed, and goes straight to generation when none did.
     """
     
-    if "user_prompt" in user_request and len(user_request.keys()) <= 2:
+    if is_free_chat(user_request):
+        cached = response_cache.get(user_request, "text")
+        if cached is not None:
+            yield from replay(cached)
+            return cached
         collected = ""
-        for chunk in free_chat_chain.stream({"user_prompt": user_request["user_prompt"]}):
+        merged = None
+        timer = LLMStreamTimer("free_chat_stream")
+        stream = _bounded_stream(
+            lambda: get_free_chat_chain().stream({"user_prompt": user_request["user_prompt"]}),
+            "free_chat_stream",
+        )
+        for chunk in stream:
+            # AIMessageChunk addition sums the per-chunk usage_metadata
+            merged = chunk if merged is None else merged + chunk
             text = getattr(chunk, "content", None) or ""
             if text:
+                timer.first_token()
                 collected += text
                 yield text
-        
+        usage = usage_from_response(merged)
+        timer.finish(usage["output_tokens"])
         try:
-            log_usage("free_chat")
+            log_usage("free_chat", usage)
         except Exception:
             pass
+        response_cache.put(user_request, collected, "text")
         return collected
 
-    
-    prep_graph = build_prep_graph()
-    state_pre = prep_graph.invoke({**user_request})
-    structured = state_pre.get("structured_data", {})
+    cached = response_cache.get(user_request, "markdown")
+    if cached is not None:
+        yield from replay(cached)
+        return cached
+
+    prep_graph = get_prep_graph()
+    state, fingerprints = _session_state(user_request, session_id)
+    state_pre = run_sync(prep_graph.ainvoke(state))
+    _remember_sections(session_id, state_pre, fingerprints)
+    structured = state_pre.get("prompt_context") or state_pre.get("structured_data", {})
+    prompt_stats = state_pre.get("prompt_stats") or {}
+    logger.info("prompt context: %s tokens (saved %s)", prompt_stats.get("compact_tokens"), prompt_stats.get("saved_tokens"))
     days = user_request.get("days", 3)
     dest = user_request.get("destination", "")
     user_prompt = user_request.get("user_prompt", "")
     target_currency = user_request.get("target_currency", "USD")
 
     collected_s = ""
-    for part in _stream_structured_itinerary(structured, days, dest, user_prompt, target_currency):
+    usage = {}
+    for part in _stream_structured_itinerary(structured, days, dest, user_prompt, target_currency, usage):
         collected_s += part
         yield part
 
     try:
-        log_usage("structured")
+        log_usage("structured", usage)
     except Exception:
         pass
 
+    if not _degraded(state_pre):
+        response_cache.put(user_request, collected_s, "markdown")
     return collected_s
@@ -0,0 +1,77 @@
+"""
+Client for the itinerary service (server.py) with the same call signatures as
+itinerary.generate_itinerary / generate_itinerary_stream, so the Streamlit app
+can run as a thin front end when ITINERARY_API_URL is set.
+"""
+import os
+import json
+from typing import Generator
+from dotenv import load_dotenv
+
+from http_client import get_session
+
+load_dotenv()
+
+ITINERARY_API_URL = os.getenv("ITINERARY_API_URL", "").rstrip("/")
+# Connect timeout, then the longest gap between stream events (keep-alives included)
+ITINERARY_API_TIMEOUT = (5, float(os.getenv("ITINERARY_API_READ_TIMEOUT", "120")))
+
+
+class ItineraryServiceError(RuntimeError):
+    pass
+
+
+def _body(user_request: dict, session_id: str = None) -> dict:
+    return {"request": user_request, "session_id": session_id}
+
+
+def generate_itinerary(user_request: dict, session_id: str = None) -> str:
+    response = get_session().post(
+        f"{ITINERARY_API_URL}/v1/itinerary",
+        json=_body(user_request, session_id),
+        timeout=ITINERARY_API_TIMEOUT,
+    )
+    if response.status_code != 200:
+        raise ItineraryServiceError(f"itinerary service returned {response.status_code}: {response.text[:200]}")
+    return response.json()["itinerary"]
+
+
+def _events(response):
+    """
+    (event, data) pairs from a text/event-stream response.
+    """
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip())
+
+
+def generate_itinerary_stream(user_request: dict, session_id: str = None) -> Generator[str, None, str]:
+    collected = ""
+    with get_session().post(
+        f"{ITINERARY_API_URL}/v1/itinerary/stream",
+        json=_body(user_request, session_id),
+        headers={"Accept": "text/event-stream"},
+        timeout=ITINERARY_API_TIMEOUT,
+        stream=True,
+    ) as response:
+        if response.status_code != 200:
+            raise ItineraryServiceError(f"itinerary service returned {response.status_code}: {response.text[:200]}")
+        response.encoding = "utf-8"
+        for event, data in _events(response):
+            if event == "chunk":
+                collected += data["text"]
+                yield data["text"]
+            elif event == "error":
+                raise ItineraryServiceError(data["error"])
+            elif event == "done":
+                break
+    return collected
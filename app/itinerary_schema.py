@@ -0,0 +1,135 @@
+import json
+
+from json_stream import parse_json
+
+# Gemini response schema (OpenAPI subset) for the JSON itinerary path
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "day_wise_plan": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "day": {"type": "INTEGER"},
+                    "morning": {"type": "STRING"},
+                    "afternoon": {"type": "STRING"},
+                    "evening": {"type": "STRING"},
+                    "meals": {"type": "STRING"},
+                    "est_cost": {"type": "STRING"},
+                },
+                "required": ["day", "morning", "afternoon", "evening"],
+                "property_ordering": ["day", "morning", "afternoon", "evening", "meals", "est_cost"],
+            },
+        },
+        "weather_summary": {"type": "STRING"},
+        "top_attractions": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "recommendations": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["day_wise_plan"],
+    "property_ordering": ["day_wise_plan", "weather_summary", "top_attractions", "recommendations"],
+}
+
+
+def _str(value) -> str:
+    return "" if value is None else str(value)
+
+
+class DayPlan:
+    __slots__ = ("day", "morning", "afternoon", "evening", "meals", "est_cost")
+
+    def __init__(self, day: int, morning: str = "", afternoon: str = "", evening: str = "",
+                 meals: str = "", est_cost: str = ""):
+        self.day = day
+        self.morning = morning
+        self.afternoon = afternoon
+        self.evening = evening
+        self.meals = meals
+        self.est_cost = est_cost
+
+    @classmethod
+    def from_dict(cls, data: dict, default_day: int = 0) -> "DayPlan":
+        day = data.get("day", default_day)
+        try:
+            day = int(day)
+        except (TypeError, ValueError):
+            day = default_day
+        return cls(
+            day,
+            _str(data.get("morning")),
+            _str(data.get("afternoon")),
+            _str(data.get("evening")),
+            _str(data.get("meals")),
+            _str(data.get("est_cost")),
+        )
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Itinerary:
+    """
+    Typed in-memory itinerary shared by the LLM, PDF export and Streamlit layers.
+    """
+
+    __slots__ = ("day_wise_plan", "weather_summary", "top_attractions", "recommendations")
+
+    def __init__(self, day_wise_plan: list = None, weather_summary: str = "",
+                 top_attractions: list = None, recommendations: list = None):
+        self.day_wise_plan = day_wise_plan or []
+        self.weather_summary = weather_summary
+        self.top_attractions = top_attractions or []
+        self.recommendations = recommendations or []
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Itinerary":
+        days = [
+            DayPlan.from_dict(d, default_day=i)
+            for i, d in enumerate(data.get("day_wise_plan") or [], start=1)
+            if isinstance(d, dict)
+        ]
+        return cls(
+            days,
+            _str(data.get("weather_summary")),
+            [_str(a) for a in data.get("top_attractions") or []],
+            [_str(r) for r in data.get("recommendations") or []],
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> "Itinerary":
+        """
+        Structured-output responses are valid JSON; anything else goes through the tolerant parser.
+        """
+        if not text:
+            return cls()
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = parse_json(text)
+        return cls.from_dict(data if isinstance(data, dict) else {})
+
+    @classmethod
+    def from_llm_text(cls, text):
+        """
+        Best effort: returns an Itinerary if the text holds a day-wise plan, else None.
+        """
+        if isinstance(text, Itinerary):
+            return text
+        if isinstance(text, dict):
+            data = text
+        else:
+            data = parse_json(str(text))
+        if not isinstance(data, dict) or "day_wise_plan" not in data:
+            return None
+        return cls.from_dict(data)
+
+    def to_dict(self) -> dict:
+        return {
+            "day_wise_plan": [d.to_dict() for d in self.day_wise_plan],
+            "weather_summary": self.weather_summary,
+            "top_attractions": list(self.top_attractions),
+            "recommendations": list(self.recommendations),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False)
@@ -0,0 +1,255 @@
+"""
+Incremental, error-tolerant JSON parser for LLM output.
+
+Single pass over the text as it streams in, with no regex backtracking and no
+eval(). A document is only parsed when the text starts with `{` or holds a
+fenced code block that starts with `{` / `[`, so Markdown links or braces in
+prose are never mistaken for JSON. Tolerates what Gemini tends to produce:
+prose around a fenced object, missing or trailing commas, single-quoted strings, Python literals
+(True/False/None), raw newlines inside strings and output cut off mid-object.
+Items of a watched list (day_wise_plan by default) are handed back as soon as
+each one closes, before the rest of the document has arrived.
+"""
+import re
+import json
+
+_SEEK, _VALUE, _STRING, _LITERAL, _DONE = range(5)
+
+# A code fence (optionally tagged, e.g. ```json) whose content starts with an object or array
+_FENCED_START = re.compile(r"```[\w-]*[ \t]*\r?\n?\s*([{\[])")
+_STRING_STOP = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_LITERAL_END = frozenset(" \t\r\n,:]}\"'`")
+_SKIP = frozenset(" \t\r\n,:`")
+_LITERALS = {
+    "true": True, "false": False, "null": None,
+    "True": True, "False": False, "None": None,
+}
+_DECODER = json.JSONDecoder(strict=False)
+_UNESCAPED_DQUOTE = re.compile(r'(?<!\\)"')
+
+
+class _Frame:
+    __slots__ = ("container", "is_obj", "key", "name")
+
+    def __init__(self, container, name):
+        self.container = container
+        self.is_obj = isinstance(container, dict)
+        self.key = None
+        self.name = name
+
+
+def _decode_string(raw: str, quote: str) -> str:
+    if quote == "'":
+        raw = _UNESCAPED_DQUOTE.sub(r'\\"', raw.replace("\\'", "'"))
+    try:
+        return _DECODER.decode(f'"{raw}"')
+    except ValueError:
+        return raw
+
+
+def _decode_literal(text: str):
+    if text in _LITERALS:
+        return _LITERALS[text]
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        return float(text)
+    except ValueError:
+        return text  # bare word: keep it as a string rather than fail
+
+
+class StreamingJSONParser:
+    """
+    feed() text chunks as they arrive; it returns the watched-list items completed
+    by that chunk. close() finishes (auto-closing anything left open) and returns
+    the parsed value, or None if no object or array was found.
+    """
+
+    def __init__(self, watch: str = "day_wise_plan"):
+        self.watch = watch
+        self.result = None
+        self._stack = []
+        self._state = _SEEK
+        self._buf = []
+        self._quote = '"'
+        self._escape = False
+        self._is_key = False
+        self._ready = []
+        self._seek = ""  # text seen before the document starts
+
+    @property
+    def done(self) -> bool:
+        return self._state == _DONE
+
+    def feed(self, chunk: str) -> list:
+        i, n = 0, len(chunk)
+        while i < n:
+            state = self._state
+            if state == _DONE:
+                break
+
+            if state == _STRING:
+                if self._escape:
+                    self._buf.append(chunk[i])
+                    self._escape = False
+                    i += 1
+                    continue
+                m = _STRING_STOP[self._quote].search(chunk, i)
+                if m is None:
+                    self._buf.append(chunk[i:])
+                    break
+                j = m.start()
+                self._buf.append(chunk[i:j])
+                if chunk[j] == "\\":
+                    self._buf.append("\\")
+                    self._escape = True
+                else:
+                    self._finish_string()
+                i = j + 1
+                continue
+
+            if state == _SEEK:
+                scanned = len(self._seek)
+                self._seek += chunk[i:]
+                start = self._find_start(scanned)
+                if start is None:
+                    break
+                chunk, i, n = self._seek[start:], 0, len(self._seek) - start
+                self._seek = ""
+                self._state = _VALUE
+                continue
+
+            ch = chunk[i]
+            if state == _LITERAL:
+                if ch not in _LITERAL_END:
+                    self._buf.append(ch)
+                    i += 1
+                    continue
+                self._finish_literal()
+                if self._state == _DONE:
+                    break
+
+            # structural position
+            if ch in _SKIP:
+                pass
+            elif ch == "{" or ch == "[":
+                self._open({} if ch == "{" else [])
+            elif ch == "}" or ch == "]":
+                self._close()
+            elif ch == '"' or ch == "'":
+                self._is_key = self._in_key_position()
+                self._quote = ch
+                self._buf = []
+                self._state = _STRING
+            else:
+                self._is_key = self._in_key_position()
+                self._buf = [ch]
+                self._state = _LITERAL
+            i += 1
+
+        ready, self._ready = self._ready, []
+        return ready
+
+    def close(self):
+        if self._state == _STRING:
+            self._finish_string()
+        elif self._state == _LITERAL:
+            self._finish_literal()
+        while self._stack:
+            self._close()
+        self._state = _DONE
+        return self.result
+
+    # -- internals --
+
+    def _find_start(self, scanned: int):
+        """
+        Offset in the buffered prefix where the document starts, or None (not yet / not JSON).
+        """
+        stripped = self._seek.lstrip()
+        if stripped.startswith("{"):
+            return len(self._seek) - len(stripped)
+        # Re-scan a little before the new text so a fence split across chunks is found
+        m = _FENCED_START.search(self._seek, max(0, scanned - 32))
+        return m.start(1) if m else None
+
+    def _in_key_position(self) -> bool:
+        return bool(self._stack) and self._stack[-1].is_obj and self._stack[-1].key is None
+
+    def _emit(self, value):
+        if not self._stack:
+            self.result = value
+            self._state = _DONE
+            return
+        frame = self._stack[-1]
+        if frame.is_obj:
+            key = frame.key if frame.key is not None else f"_{len(frame.container)}"
+            frame.container[key] = value
+            frame.key = None
+        else:
+            frame.container.append(value)
+            if frame.name == self.watch:
+                self._ready.append(value)
+
+    def _finish_string(self):
+        text = _decode_string("".join(self._buf), self._quote)
+        self._buf = []
+        self._escape = False
+        self._state = _VALUE
+        if self._is_key:
+            self._stack[-1].key = text
+        else:
+            self._emit(text)
+
+    def _finish_literal(self):
+        text = "".join(self._buf).strip()
+        self._buf = []
+        self._state = _VALUE
+        if self._is_key:
+            self._stack[-1].key = text  # unquoted key
+        else:
+            self._emit(_decode_literal(text))
+
+    def _open(self, container):
+        name = None
+        if not self._stack:
+            self.result = container
+        else:
+            parent = self._stack[-1]
+            if parent.is_obj:
+                name = parent.key if parent.key is not None else f"_{len(parent.container)}"
+                parent.container[name] = container
+                parent.key = None
+            else:
+                parent.container.append(container)
+        self._stack.append(_Frame(container, name))
+
+    def _close(self):
+        if not self._stack:
+            return
+        frame = self._stack.pop()
+        if not self._stack:
+            self._state = _DONE
+            return
+        parent = self._stack[-1]
+        if not parent.is_obj and parent.name == self.watch:
+            self._ready.append(frame.container)
+
+
+def iter_watched(chunks, watch: str = "day_wise_plan"):
+    """
+    Yield each completed item of the `watch` list while `chunks` are still streaming.
+    """
+    parser = StreamingJSONParser(watch)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+        if parser.done:
+            break
+
+
+def parse_json(text: str, watch: str = "day_wise_plan"):
+    parser = StreamingJSONParser(watch)
+    parser.feed(text)
+    return parser.close()
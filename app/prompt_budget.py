@@ -0,0 +1,186 @@
+import os
+import json
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Max tokens of structured context sent to Gemini per itinerary
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "2500"))
+
+# (max list items, max string length) per shrink level; later levels are tighter
+_LEVELS = [(8, 400), (5, 240), (3, 160), (2, 100), (1, 60)]
+# Sections dropped first when even the tightest level is over budget
+_DROP_ORDER = ["activities", "accommodation", "country_info", "budget", "research", "transport"]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English/JSON).
+    """
+    return (len(text) + 3) // 4
+
+
+def _text(value, limit: int):
+    if value is None:
+        return None
+    value = str(value)
+    return value if len(value) <= limit else value[:limit - 1] + "…"
+
+
+def _error(section):
+    if isinstance(section, dict) and "error" in section:
+        return {"error": _text(section["error"], 120)}
+    return None
+
+
+def _research(section, items, limit):
+    if not isinstance(section, dict):
+        return None
+    attractions = section.get("attractions")
+    if isinstance(attractions, list):
+        attractions = [
+            {"name": a.get("name"), "rating": a.get("rating"), "type": a.get("type")}
+            for a in attractions[:items] if isinstance(a, dict)
+        ]
+    else:
+        attractions = _error(attractions)
+    notes = section.get("cultural_notes") or []
+    return {"attractions": attractions, "notes": [_text(n, limit) for n in notes[:max(1, items // 2)]]}
+
+
+def _weather(section, items, limit):
+    if not isinstance(section, list):
+        return _error(section)
+    # Keep every forecast day: the itinerary is planned per day
+    return [[d.get("date"), d.get("avg_temp_c"), d.get("condition")] for d in section if isinstance(d, dict)]
+
+
+def _budget(section, items, limit):
+    if not isinstance(section, dict):
+        return None
+    rate = section.get("exchange_rate") or {}
+    return {"exchange_rate": _error(rate) or rate, "food": (section.get("categories") or {}).get("food")}
+
+
+def _transport(section, items, limit):
+    if not isinstance(section, dict):
+        return None
+    if section.get("error"):
+        return _error(section)
+    flights = section.get("flights")
+    if not flights:
+        return {"note": _text(section.get("note"), limit)}
+    offers = []
+    for offer in (flights.get("data") or [])[:items]:
+        legs = []
+        for itinerary in offer.get("itineraries", []):
+            for seg in itinerary.get("segments", []):
+                legs.append(
+                    f"{seg.get('carrierCode', '')}{seg.get('number', '')} "
+                    f"{seg.get('departure', {}).get('iataCode')} {seg.get('departure', {}).get('at')} -> "
+                    f"{seg.get('arrival', {}).get('iataCode')} {seg.get('arrival', {}).get('at')}"
+                )
+        price = offer.get("price", {})
+        offers.append({"price": f"{price.get('total')} {price.get('currency', '')}".strip(), "legs": legs})
+    return {"flights": offers, "local": section.get("local_transport")}
+
+
+def _accommodation(section, items, limit):
+    if not isinstance(section, dict):
+        return None
+    if "data" not in section:
+        return _error(section) or {"error": "no hotel data"}
+    hotels = []
+    for hotel in section["data"][:items]:
+        distance = hotel.get("distance") or {}
+        hotels.append([_text(hotel.get("name"), 60), distance.get("value"), distance.get("unit")])
+    return hotels
+
+
+def _activities(section, items, limit):
+    if not isinstance(section, list):
+        return _error(section)
+    return [
+        {"name": p.get("name"), "rating": p.get("rating"), "address": _text(p.get("formatted_address"), 80)}
+        for p in section[:items] if isinstance(p, dict)
+    ]
+
+
+def _country_info(section, items, limit):
+    if not isinstance(section, dict):
+        return None
+    if "error" in section:
+        return _error(section)
+    currencies = section.get("currencies") or {}
+    return {
+        "name": (section.get("name") or {}).get("common"),
+        "capital": (section.get("capital") or [None])[0],
+        "region": section.get("subregion") or section.get("region"),
+        "currencies": [f"{code} ({c.get('name')})" for code, c in currencies.items()],
+        "languages": list((section.get("languages") or {}).values())[:items],
+        "timezones": (section.get("timezones") or [])[:2],
+        "drives_on": (section.get("car") or {}).get("side"),
+    }
+
+
+# Section -> projection; media (photo URLs) never reaches the prompt
+_PROJECTIONS = {
+    "research": _research,
+    "weather": _weather,
+    "budget": _budget,
+    "transport": _transport,
+    "accommodation": _accommodation,
+    "activities": _activities,
+    "country_info": _country_info,
+}
+
+
+def _project(structured: dict, items: int, limit: int) -> dict:
+    projected = {}
+    for name, project in _PROJECTIONS.items():
+        try:
+            value = project(structured.get(name), items, limit)
+        except (AttributeError, TypeError, KeyError):
+            value = _error(structured.get(name))
+        if value:
+            projected[name] = value
+    if structured.get("missing_sections"):
+        projected["missing_sections"] = list(structured["missing_sections"])
+    return projected
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def compact_structured_data(structured, budget: int = PROMPT_TOKEN_BUDGET):
+    """
+    Project the coordinator's structured_data down to the fields the itinerary
+    needs and serialize it compactly within `budget` tokens.
+    Returns (prompt_text, stats) where stats reports the tokens saved versus
+    interpolating the raw dict.
+    """
+    structured = structured or {}
+    raw_tokens = estimate_tokens(str(structured))
+
+    projected = {}
+    for items, limit in _LEVELS:
+        projected = _project(structured, items, limit)
+        text = _dumps(projected)
+        if estimate_tokens(text) <= budget:
+            break
+    else:
+        for name in _DROP_ORDER:
+            if estimate_tokens(text) <= budget:
+                break
+            projected.pop(name, None)
+            text = _dumps(projected)
+
+    compact_tokens = estimate_tokens(text)
+    stats = {
+        "raw_tokens": raw_tokens,
+        "compact_tokens": compact_tokens,
+        "saved_tokens": max(0, raw_tokens - compact_tokens),
+        "budget": budget,
+    }
+    return text, stats
@@ -1,66 +1,131 @@
 import os
-import glob
+import atexit
+import threading
 from dotenv import load_dotenv
-from langchain_chroma import Chroma
-from langchain_community.document_loaders import TextLoader
-from google import genai
 
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+import metrics
 
+from embedding_cache import CachedEmbeddings, embedding_cache
+from embeddings import EMBEDDING_BACKEND, GeminiBackend, get_backend
+from hybrid_retriever import HybridRetriever
 
-client = genai.Client(api_key=GEMINI_API_KEY)
+load_dotenv()
 
-EMBEDDING_MODEL = "models/embedding-001"
 PERSIST_DIR = "chroma_store"
-
-
-class GeminiEmbeddings:
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        response = client.models.embed_content(
-            model=EMBEDDING_MODEL,
-            contents=texts
-        )
-        return [item.values for item in response.embeddings]
-
-    def embed_query(self, text: str) -> list[float]:
-        response = client.models.embed_content(
-            model=EMBEDDING_MODEL,
-            contents=[text]
-        )
-        return response.embeddings[0].values
+# Vectors from different backends have different dimensions, so each backend
+# gets its own collection; Gemini keeps the original name.
+COLLECTION_NAME = os.getenv("CHROMA_COLLECTION") or (
+    "travel_collection" if EMBEDDING_BACKEND == "gemini" else f"travel_collection_{EMBEDDING_BACKEND}"
+)
+
+# Kept for callers that imported the Gemini embedder from here
+GeminiEmbeddings = GeminiBackend
+
+
+# ---- Shared vector store ----
+# Opening Chroma reloads the sqlite file and HNSW segment, so each
+# (persist_dir, collection) pair is opened once per process and reused.
+_embeddings = None
+_stores = {}
+_retrievers = {}
+_stores_lock = threading.Lock()
+
+
+def get_embeddings() -> CachedEmbeddings:
+    global _embeddings
+    if _embeddings is None:
+        with _stores_lock:
+            if _embeddings is None:
+                # Repeated queries / unchanged chunks are served from the embedding cache
+                backend = get_backend()
+                _embeddings = CachedEmbeddings(backend, backend.model_name, embedding_cache)
+    return _embeddings
+
+
+def get_vectorstore(persist_dir: str = PERSIST_DIR, collection_name: str = COLLECTION_NAME) -> "Chroma":
+    key = (os.path.abspath(persist_dir), collection_name)
+    store = _stores.get(key)
+    if store is None:
+        embeddings = get_embeddings()
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None:
+                # chromadb is a heavy import; only pay for it when a store is opened
+                from langchain_chroma import Chroma
+
+                store = Chroma(
+                    collection_name=collection_name,
+                    persist_directory=persist_dir,
+                    embedding_function=embeddings,
+                )
+                _stores[key] = store
+    return store
+
+
+def warm_up(persist_dir: str = PERSIST_DIR, collection_name: str = COLLECTION_NAME):
+    """
+    Open the store and touch the ANN index so the first real query doesn't pay for it.
+    Uses a stored vector as the probe, so no embedding call is made.
+    """
+    store = get_vectorstore(persist_dir, collection_name)
+    sample = store.get(limit=1, include=["embeddings"])
+    embeddings = sample.get("embeddings")
+    if embeddings is not None and len(embeddings):
+        store.similarity_search_by_vector(list(embeddings[0]), k=1)
+    return store
+
+
+def close_vectorstores():
+    """
+    Release every open store (stops the Chroma clients' background systems).
+    """
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+        _retrievers.clear()
+    for store in stores:
+        system = getattr(getattr(store, "_client", None), "_system", None)
+        if system is not None:
+            try:
+                system.stop()
+            except Exception:
+                pass
+
+
+atexit.register(close_vectorstores)
 
 
 # ---- Ingestion ----
 def ingest_documents(data_path="data/travel_blogs"):
-    docs = []
-    for file_path in glob.glob(f"{data_path}/*.txt"):
-        loader = TextLoader(file_path, encoding="utf-8")
-        docs.extend(loader.load())
-
-    embeddings = GeminiEmbeddings()
-
-    vectordb = Chroma.from_documents(
-        documents=docs,
-        embedding=embeddings,  
-        collection_name="travel_collection",
-        persist_directory=PERSIST_DIR,
-    )
-
-    print(f"Ingested {len(docs)} documents into ChromaDB")
-
-
-def query_documents(query: str):
-    embeddings = GeminiEmbeddings()
-
-    vectordb = Chroma(
-        collection_name="travel_collection",
-        persist_directory=PERSIST_DIR,
-        embedding_function=embeddings,
-    )
-
-    results = vectordb.similarity_search(query, k=5)
-    return [r.page_content for r in results]
+    """
+    Chunked, incremental ingestion (see ingest.py for the pipeline and CLI).
+    """
+    from ingest import run_ingestion
+
+    stats = run_ingestion(data_path)
+    with _stores_lock:
+        retrievers = list(_retrievers.values())
+    for retriever in retrievers:
+        retriever.invalidate()
+    print(f"Ingested {stats['embedded']} new chunks ({stats['skipped']} unchanged) into ChromaDB")
+
+
+def get_retriever(persist_dir: str = PERSIST_DIR, collection_name: str = COLLECTION_NAME) -> HybridRetriever:
+    key = (os.path.abspath(persist_dir), collection_name)
+    retriever = _retrievers.get(key)
+    if retriever is None:
+        store = get_vectorstore(persist_dir, collection_name)
+        with _stores_lock:
+            retriever = _retrievers.setdefault(key, HybridRetriever(store, get_embeddings()))
+    return retriever
+
+
+def query_documents(query: str, destination: str = None, k: int = 5):
+    """
+    Hybrid BM25 + vector search; `destination` narrows the candidates before scoring.
+    """
+    with metrics.timer("rag_query_seconds"):
+        return get_retriever().search(query, k=k, destination=destination)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+"""
+Per-provider protection for upstream calls: a circuit breaker driven by the
+rolling error rate and latency, retry backoff with full jitter, and a token
+bucket sized to the vendor's quota.
+
+http_client asks provider_for(endpoint) before every request. While a breaker
+is open, calls fail immediately with CircuitOpenError so agents don't spend
+their budget on a vendor that is down, and api_cache can answer from an older
+entry instead.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Breaker: trips when, over the last BREAKER_WINDOW seconds and at least
+# BREAKER_MIN_CALLS calls, the failure rate or the slow-call rate is too high
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "60"))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_SLOW_CALL = float(os.getenv("BREAKER_SLOW_CALL", "5"))
+BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "2"))
+# A half-open breaker whose probes all went quiet (no outcome) this long reopens
+BREAKER_PROBE_TIMEOUT = float(os.getenv("BREAKER_PROBE_TIMEOUT", "30"))
+
+# Retries apply to GETs only (token POSTs are not retried)
+RETRY_ATTEMPTS = int(os.getenv("HTTP_RETRY_ATTEMPTS", "2"))
+RETRY_BASE_DELAY = float(os.getenv("HTTP_RETRY_BASE_DELAY", "0.2"))
+RETRY_MAX_DELAY = float(os.getenv("HTTP_RETRY_MAX_DELAY", "2"))
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Longest a call may queue for a rate-limit token before it is refused
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "2"))
+
+# http_client endpoint label -> vendor (one breaker and one quota per vendor)
+PROVIDERS = {
+    "weather": "weatherapi",
+    "places": "serpapi",
+    "exchange_rate": "exchangerates",
+    "amadeus_token": "amadeus",
+    "flights": "amadeus",
+    "hotels": "amadeus",
+    "google_places": "google_places",
+    "place_details": "google_places",
+    "country_info": "restcountries",
+    "photos": "unsplash",
+}
+
+# (requests per second, burst); RATE_LIMIT_<PROVIDER>="rate,burst" overrides, "0" disables
+RATE_LIMITS = {
+    "amadeus": (10, 10),  # self-service test environment: 10 TPS
+    "serpapi": (5, 10),
+    "google_places": (50, 100),
+    "unsplash": (50 / 3600, 50),  # demo apps: 50 requests/hour
+    "weatherapi": (20, 40),
+    "exchangerates": (5, 10),
+    "restcountries": (10, 20),
+}
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """
+    The call was refused locally without reaching the provider.
+    """
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class RateLimitedError(UpstreamUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed -> open when the rolling failure or slow-call rate crosses its threshold;
+    open -> half_open after open_seconds; half_open lets a few probe calls through
+    and closes again if they all succeed, or reopens on the first failure. If the
+    probes never report back within probe_timeout, it reopens rather than wait forever.
+    """
+
+    def __init__(self, name: str, window: float = BREAKER_WINDOW, min_calls: int = BREAKER_MIN_CALLS,
+                 failure_rate: float = BREAKER_FAILURE_RATE, slow_call: float = BREAKER_SLOW_CALL,
+                 slow_rate: float = BREAKER_SLOW_RATE, open_seconds: float = BREAKER_OPEN_SECONDS,
+                 half_open_calls: int = BREAKER_HALF_OPEN_CALLS, probe_timeout: float = BREAKER_PROBE_TIMEOUT):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.probe_timeout = probe_timeout
+        self.state = CLOSED
+        self._calls = deque()  # (timestamp, failed, slow)
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_successes = 0
+        self._probe_activity = 0.0
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str, now: float):
+        self.state = state
+        self._calls.clear()
+        self._failures = self._slow = 0
+        self._probes = self._probe_successes = 0
+        self._probe_activity = now
+        if state == OPEN:
+            self._opened_at = now
+        metrics.inc("breaker_transitions_total", provider=self.name, state=state)
+        logger.warning("circuit %s -> %s", self.name, state)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == OPEN:
+                now = time.monotonic()
+                if now - self._opened_at < self.open_seconds:
+                    return False
+                self._transition(HALF_OPEN, now)
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    now = time.monotonic()
+                    if now - self._probe_activity >= self.probe_timeout:
+                        self._transition(OPEN, now)
+                    return False
+                self._probes += 1
+                self._probe_activity = time.monotonic()
+            return True
+
+    def release(self):
+        """
+        An admitted call never reached the provider (cancelled or rate limited).
+        """
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record(self, ok: bool, latency: float):
+        now = time.monotonic()
+        slow = latency >= self.slow_call
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if not ok or slow:
+                    self._transition(OPEN, now)
+                else:
+                    self._probe_activity = now
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_calls:
+                        self._transition(CLOSED, now)
+                return
+            if self.state == OPEN:
+                return  # a call that started before the breaker opened
+
+            self._calls.append((now, not ok, slow))
+            self._failures += not ok
+            self._slow += slow
+            horizon = now - self.window
+            while self._calls and self._calls[0][0] < horizon:
+                _, failed, was_slow = self._calls.popleft()
+                self._failures -= failed
+                self._slow -= was_slow
+            n = len(self._calls)
+            if n >= self.min_calls and (
+                self._failures / n >= self.failure_rate or self._slow / n >= self.slow_rate
+            ):
+                self._transition(OPEN, now)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            n = len(self._calls)
+            return {
+                "state": self.state,
+                "calls": n,
+                "failure_rate": self._failures / n if n else 0.0,
+                "slow_rate": self._slow / n if n else 0.0,
+            }
+
+
+class TokenBucket:
+    """
+    `rate` tokens per second up to `burst`. Callers reserve a token and sleep
+    until it is due; a reservation further out than max_wait is refused.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float = RATE_LIMIT_MAX_WAIT) -> float:
+        """
+        Take a token; returns how long to wait before using it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if wait > max_wait:
+                raise RateLimitedError(f"rate limit: next slot in {wait:.1f}s")
+            self._tokens -= 1
+            return wait
+
+
+def _rate_limit(provider: str):
+    raw = os.getenv(f"RATE_LIMIT_{provider.upper()}")
+    if raw is None:
+        return RATE_LIMITS.get(provider)
+    parts = [float(p) for p in raw.split(",")]
+    if not parts[0]:
+        return None
+    return parts[0], parts[1] if len(parts) > 1 else max(1.0, parts[0])
+
+
+class Provider:
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        limit = _rate_limit(name)
+        self.bucket = TokenBucket(*limit) if limit else None
+
+    def _admit(self) -> float:
+        if not self.breaker.allow():
+            metrics.inc("breaker_short_circuits_total", provider=self.name)
+            raise CircuitOpenError(f"{self.name} circuit open")
+        if self.bucket is None:
+            return 0.0
+        try:
+            return self.bucket.reserve()
+        except RateLimitedError:
+            self.breaker.release()
+            metrics.inc("rate_limited_total", provider=self.name)
+            raise
+
+    def before_call(self):
+        wait = self._admit()
+        if wait:
+            try:
+                time.sleep(wait)
+            except BaseException:
+                self.breaker.release()
+                raise
+
+    async def abefore_call(self):
+        wait = self._admit()
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                # cancelled (agent budget / deadline) while queued for a token: give the probe slot back
+                self.breaker.release()
+                raise
+
+    def record(self, ok: bool, latency: float):
+        self.breaker.record(ok, latency)
+
+    def release(self):
+        self.breaker.release()
+
+    def backoff(self, attempt: int, retry_after: float = None) -> float:
+        """
+        Full-jitter exponential backoff, stretched to honour Retry-After (within RETRY_MAX_DELAY).
+        """
+        metrics.inc("upstream_retries_total", provider=self.name)
+        delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+        if retry_after:
+            delay = max(delay, min(retry_after, RETRY_MAX_DELAY))
+        return delay
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def provider_for(endpoint: str) -> Provider:
+    name = PROVIDERS.get(endpoint, endpoint)
+    provider = _providers.get(name)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(name)
+            if provider is None:
+                provider = _providers[name] = Provider(name)
+    return provider
+
+
+def breaker_states() -> dict:
+    with _providers_lock:
+        providers = list(_providers.values())
+    return {p.name: p.breaker.snapshot() for p in providers}
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import hashlib
+import datetime
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from dotenv import load_dotenv
+
+from api_cache import CACHE_POLICIES
+
+load_dotenv()
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Trips starting within the forecast window depend on live weather; later trips don't
+FORECAST_WINDOW_DAYS = 14
+NEAR_TRIP_TTL = CACHE_POLICIES["weather"]
+FAR_TRIP_TTL = int(os.getenv("RESPONSE_CACHE_FAR_TTL", str(6 * 3600)))
+FREE_CHAT_TTL = int(os.getenv("RESPONSE_CACHE_FREE_CHAT_TTL", str(6 * 3600)))
+# Free-chat prompts can also match a cached answer by embedding similarity
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "0") == "1"
+SEMANTIC_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+REPLAY_CHUNK_CHARS = 80
+
+# Request fields that change the generated itinerary
+_STRUCTURED_FIELDS = (
+    "origin", "destination", "destination_code", "country", "date", "days",
+    "budget_currency", "target_currency", "interests", "num_travelers", "user_prompt",
+)
+
+
+def _norm(value):
+    if isinstance(value, str):
+        return " ".join(value.split()).lower()
+    if isinstance(value, (list, tuple)):
+        return sorted(_norm(v) for v in value)
+    return value
+
+
+def is_free_chat(user_request: dict) -> bool:
+    return "user_prompt" in user_request and len(user_request.keys()) <= 2
+
+
+def canonical_request(user_request: dict) -> dict:
+    """
+    Normalized view of a request: case/whitespace folded, interests sorted,
+    empty fields dropped, so equivalent requests from different users match.
+    """
+    if is_free_chat(user_request):
+        return {"mode": "free_chat", "user_prompt": _norm(user_request["user_prompt"])}
+    canonical = {"mode": "structured"}
+    for field in _STRUCTURED_FIELDS:
+        value = _norm(user_request.get(field))
+        if value not in (None, "", []):
+            canonical[field] = value
+    return canonical
+
+
+def request_key(user_request: dict, variant: str = "") -> str:
+    """
+    `variant` separates different renderings of the same request (e.g. JSON vs Markdown).
+    """
+    raw = json.dumps([variant, canonical_request(user_request)], sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def ttl_for(user_request: dict) -> int:
+    """
+    Cached itineraries live as long as the weather data they used is still good.
+    """
+    if is_free_chat(user_request):
+        return FREE_CHAT_TTL
+    try:
+        start = datetime.date.fromisoformat(str(user_request.get("date")))
+    except ValueError:
+        return NEAR_TRIP_TTL
+    days_out = (start - datetime.date.today()).days
+    return NEAR_TRIP_TTL if days_out <= FORECAST_WINDOW_DAYS else FAR_TRIP_TTL
+
+
+def replay(text: str, chunk_chars: int = REPLAY_CHUNK_CHARS):
+    """
+    Yield cached text in word-aligned pieces so st.write_stream still streams it.
+    """
+    start = 0
+    while start < len(text):
+        end = min(start + chunk_chars, len(text))
+        if end < len(text):
+            space = text.find(" ", end)
+            end = len(text) if space == -1 else space + 1
+        yield text[start:end]
+        start = end
+
+
+class ResponseCache:
+    """
+    LRU of generated itineraries keyed by canonical request, bounded by entry
+    count and total text size, with an optional semantic index for free chat.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 semantic: bool = RESPONSE_CACHE_SEMANTIC, threshold: float = SEMANTIC_THRESHOLD):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.semantic = semantic
+        self.threshold = threshold
+        self._data = OrderedDict()  # key -> (text, expires_at, unit vector or None)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._embedder = None
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._data), bytes=self._bytes)
+
+    def _embed(self, text: str):
+        if self._embedder is None:
+            from embedding_cache import CachedEmbeddings, embedding_cache
+            from embeddings import get_backend
+            backend = get_backend()
+            self._embedder = CachedEmbeddings(backend, backend.model_name, embedding_cache)
+        vector = np.asarray(self._embedder.embed_query(text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _drop(self, key: str):
+        text, _, _ = self._data.pop(key)
+        self._bytes -= len(text)
+
+    def _semantic_match(self, vector, now: float):
+        best_key, best_score = None, self.threshold
+        for key, (_, expires_at, other) in self._data.items():
+            if other is None or expires_at < now or other.shape != vector.shape:
+                continue
+            score = float(vector @ other)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, user_request: dict, variant: str = ""):
+        key = request_key(user_request, variant)
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] >= now:
+                self._data.move_to_end(key)
+                self._stats["hits"] += 1
+                return item[0]
+            if item is not None:
+                self._drop(key)
+        if self.semantic and is_free_chat(user_request):
+            vector = self._embed(canonical_request(user_request)["user_prompt"])
+            with self._lock:
+                match = self._semantic_match(vector, now)
+                if match is not None:
+                    self._data.move_to_end(match)
+                    self._stats["semantic_hits"] += 1
+                    return self._data[match][0]
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, user_request: dict, text: str, variant: str = ""):
+        if not text:
+            return
+        key = request_key(user_request, variant)
+        vector = None
+        if self.semantic and is_free_chat(user_request):
+            vector = self._embed(canonical_request(user_request)["user_prompt"])
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (text, time.time() + ttl_for(user_request), vector)
+            self._bytes += len(text)
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                self._drop(next(iter(self._data)))
+
+
+response_cache = ResponseCache()
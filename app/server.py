@@ -0,0 +1,293 @@
+"""
+Headless itinerary service: JSON and Server-Sent-Events endpoints around
+generate_itinerary / generate_itinerary_stream, for running several workers
+per box behind a load balancer (Streamlit can point at it via ITINERARY_API_URL).
+
+    cd app && python server.py                      # SERVER_WORKERS processes on SERVER_PORT
+    uvicorn server:app --workers 4 --timeout-graceful-shutdown 30
+
+POST /v1/itinerary          {"request": {...}, "session_id": "..."} -> {"itinerary": ..., "mode": ...}
+                            (502 + {"error": ...} when Gemini blocks or returns nothing)
+POST /v1/itinerary/stream   same body -> text/event-stream of `chunk` events, then `done` (or `error`)
+GET  /healthz, /readyz      liveness; readiness turns 503 while the worker drains
+GET  /metrics, /metrics.json this worker's metrics (each worker process keeps its own)
+
+On SIGTERM the worker marks itself draining (/readyz answers 503, new
+requests get 503 + Retry-After), uvicorn stops accepting connections and waits
+up to SERVER_DRAIN_SECONDS for in-flight requests and streams to finish.
+
+Sessions (sessions.SessionStore: the agent data a refinement reuses) live in
+each worker's memory. With more than one worker the balancer must route a
+session_id to the same worker (sticky sessions, e.g. hashing the session_id);
+otherwise follow-ups still work but rerun every agent.
+"""
+import os
+import json
+import time
+import signal
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, closing
+from dotenv import load_dotenv
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+import metrics
+from itinerary import (
+    ItineraryGenerationError, generate_itinerary, generate_itinerary_stream, get_prep_graph, get_full_graph,
+)
+from itinerary_schema import Itinerary
+from response_cache import is_free_chat
+from resilience import breaker_states
+
+load_dotenv()
+# Workers import this module, so the app's own loggers are configured here; uvicorn configures its own
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logger = logging.getLogger(__name__)
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+SERVER_DRAIN_SECONDS = float(os.getenv("SERVER_DRAIN_SECONDS", "30"))
+# Requests one worker runs at once; beyond it callers get 503 + Retry-After so
+# the balancer can send them to a less busy worker instead of queueing here
+SERVER_MAX_INFLIGHT = int(os.getenv("SERVER_MAX_INFLIGHT", "32"))
+# Comment line sent on idle streams so proxies don't cut them during agent fan-out
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
+
+class WorkerState:
+    def __init__(self, max_inflight: int = SERVER_MAX_INFLIGHT):
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.draining = False
+
+    def acquire(self) -> bool:
+        # Only touched from the event loop thread, so no lock is needed
+        if self.draining or self.inflight >= self.max_inflight:
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self):
+        self.inflight -= 1
+
+
+worker = WorkerState()
+
+
+def _drain_on_signal():
+    # uvicorn's own handler (chained below) only returns control to the lifespan
+    # after its graceful wait, so flag draining as soon as the signal arrives
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        previous = signal.getsignal(sig)
+        if not callable(previous):
+            continue  # default/ignored, or handled on the event loop by this uvicorn version
+
+        def handler(signum, frame, previous=previous):
+            worker.draining = True
+            previous(signum, frame)
+
+        try:
+            signal.signal(sig, handler)
+        except ValueError:
+            return  # not the main thread (e.g. a test client); nothing to chain to
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """
+    Gives the worker slot back when the response is over, even if the body
+    generator never started (client gone before the first byte).
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            worker.release()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile the graphs (and import LangGraph) before the first request arrives
+    await run_in_threadpool(get_prep_graph)
+    await run_in_threadpool(get_full_graph)
+    _drain_on_signal()
+    yield
+    worker.draining = True
+    deadline = time.monotonic() + SERVER_DRAIN_SECONDS
+    while worker.inflight and time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+    if worker.inflight:
+        logger.warning("shutting down with %d requests still running", worker.inflight)
+
+
+app = FastAPI(title="TravelCraft AI", lifespan=lifespan)
+
+
+async def _parse_body(request: Request) -> tuple:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(400, "body is not valid JSON")
+    user_request = body.get("request") if isinstance(body, dict) else None
+    if not isinstance(user_request, dict) or not user_request:
+        raise HTTPException(422, "body must be {\"request\": {...}, \"session_id\": optional}")
+    if not is_free_chat(user_request) and not user_request.get("destination"):
+        raise HTTPException(422, "structured requests need a destination (or send only user_prompt)")
+    session_id = body.get("session_id")
+    return user_request, str(session_id) if session_id else None
+
+
+def _overloaded() -> JSONResponse:
+    metrics.inc("server_rejected_total", reason="draining" if worker.draining else "busy")
+    return JSONResponse(
+        {"error": "draining" if worker.draining else "too many requests in flight"},
+        status_code=503, headers={"Retry-After": "1"},
+    )
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/v1/itinerary")
+async def itinerary(request: Request):
+    user_request, session_id = await _parse_body(request)
+    if not worker.acquire():
+        return _overloaded()
+    mode = "free_chat" if is_free_chat(user_request) else "structured"
+    started = time.perf_counter()
+    status = "200"
+    try:
+        text = await run_in_threadpool(generate_itinerary, user_request, session_id)
+        payload = {"mode": mode, "itinerary": text}
+        if mode == "structured":
+            payload["itinerary_obj"] = Itinerary.from_json(text).to_dict()
+        return payload
+    except ItineraryGenerationError as e:
+        # Gemini blocked or returned nothing: an upstream failure, not an itinerary
+        status = "502"
+        logger.warning("itinerary request failed: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=502)
+    except Exception as e:
+        status = "500"
+        logger.exception("itinerary request failed")
+        return JSONResponse({"error": f"{type(e).__name__}: {e}"}, status_code=500)
+    finally:
+        worker.release()
+        metrics.observe("server_request_seconds", time.perf_counter() - started, route="itinerary", mode=mode)
+        metrics.inc("server_requests_total", route="itinerary", status=status)
+
+
+@app.post("/v1/itinerary/stream")
+async def itinerary_stream(request: Request):
+    user_request, session_id = await _parse_body(request)
+    if not worker.acquire():
+        return _overloaded()
+    mode = "free_chat" if is_free_chat(user_request) else "structured"
+
+    async def events():
+        started = time.perf_counter()
+        status = "200"
+        # The pipeline is synchronous, so chunks are pulled on a worker thread
+        generator = generate_itinerary_stream(user_request, session_id)
+        stop = threading.Event()
+
+        def pull():
+            # Runs on the worker thread; once the response is gone the chunk in
+            # flight is dropped and the pipeline closed, so no more tokens are spent
+            with closing(generator):
+                for text in generator:
+                    if stop.is_set():
+                        return
+                    yield text
+
+        source = pull()
+        chunks = iterate_in_threadpool(source).__aiter__()
+        pending = None
+        try:
+            yield _sse("start", {"mode": mode})
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(chunks.__anext__())
+                done, _ = await asyncio.wait({pending}, timeout=SSE_KEEPALIVE_SECONDS)
+                if not done:
+                    yield ": keep-alive\n\n"
+                    continue
+                step, pending = pending, None
+                try:
+                    text = step.result()
+                except StopAsyncIteration:
+                    break
+                yield _sse("chunk", {"text": text})
+            yield _sse("done", {"mode": mode})
+        except asyncio.CancelledError:
+            status = "499"  # client went away; Starlette cancels the response
+            raise
+        except Exception as e:
+            status = "500"
+            logger.exception("itinerary stream failed")
+            yield _sse("error", {"error": f"{type(e).__name__}: {e}"})
+        finally:
+            if pending is not None:
+                # The thread can't be interrupted mid-chunk; it closes the pipeline when that chunk arrives
+                stop.set()
+                pending.cancel()
+            else:
+                source.close()
+            metrics.observe("server_request_seconds", time.perf_counter() - started, route="stream", mode=mode)
+            metrics.inc("server_requests_total", route="stream", status=status)
+
+    return SlotStreamingResponse(
+        events(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    body = {"inflight": worker.inflight, "max_inflight": worker.max_inflight, "breakers": breaker_states()}
+    if worker.draining:
+        return JSONResponse({"status": "draining", **body}, status_code=503)
+    return {"status": "ready", **body}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics.json")
+async def json_metrics():
+    return metrics.dump_json()
+
+
+def main():
+    import uvicorn
+
+    if SERVER_WORKERS > 1:
+        logger.warning(
+            "%d workers each keep their own sessions; route requests with the same "
+            "session_id to the same worker or refinements won't reuse agent data", SERVER_WORKERS,
+        )
+
+    uvicorn.run(
+        "server:app",
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=SERVER_WORKERS,
+        timeout_graceful_shutdown=SERVER_DRAIN_SECONDS,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SESSION_MAX = int(os.getenv("SESSION_MAX", "1000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", str(2 * 3600)))
+
+
+class SessionStore:
+    """
+    Per-session values kept in process: LRU by last use, bounded by session
+    count, and idle sessions expire. Each pipeline stage owns its own keys.
+    Not shared between processes (see server.py on multi-worker deployments).
+    """
+
+    def __init__(self, max_sessions: int = SESSION_MAX, idle_ttl: float = SESSION_IDLE_TTL):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._data = OrderedDict()  # session_id -> (last_used, {key: value})
+        self._lock = threading.Lock()
+
+    def _values(self, session_id: str, create: bool):
+        now = time.time()
+        item = self._data.get(session_id)
+        if item is not None and now - item[0] > self.idle_ttl:
+            del self._data[session_id]
+            item = None
+        if item is None:
+            if not create:
+                return None
+            item = (now, {})
+        self._data[session_id] = (now, item[1])
+        self._data.move_to_end(session_id)
+        while len(self._data) > self.max_sessions:
+            self._data.popitem(last=False)
+        return item[1]
+
+    def get(self, session_id: str, key: str, default=None):
+        with self._lock:
+            values = self._values(session_id, create=False)
+            return default if values is None else values.get(key, default)
+
+    def set(self, session_id: str, key: str, value):
+        with self._lock:
+            self._values(session_id, create=True)[key] = value
+
+    def drop(self, session_id: str):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+sessions = SessionStore()
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key: the first caller (leader) runs
+    the function, everyone who arrives while it is in flight waits for that result.
+
+    Calls are tracked as concurrent.futures.Future objects so threads (do) and
+    coroutines (ado) can join the same flight.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._tasks = set()
+        self._stats = {"leaders": 0, "followers": 0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+    def in_flight(self, key) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def _join(self, key):
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats["followers"] += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self._stats["leaders"] += 1
+            return future, True
+
+    def _settle(self, key, future: Future, value=None, exc: BaseException = None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(value)
+
+    def _run(self, key, future: Future, fn):
+        try:
+            value = fn()
+        except BaseException as e:
+            self._settle(key, future, exc=e)
+        else:
+            self._settle(key, future, value)
+
+    async def _arun(self, key, future: Future, fn):
+        try:
+            value = await fn()
+        except BaseException as e:
+            self._settle(key, future, exc=e)
+        else:
+            self._settle(key, future, value)
+
+    def do(self, key, fn):
+        """
+        Blocking: run fn() once per key across all concurrent callers.
+        """
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn)
+        return future.result()
+
+    async def ado(self, key, fn):
+        """
+        Async: await fn() once per key across all concurrent callers.
+        """
+        future, leader = self._join(key)
+        if leader:
+            # Run detached: cancelling one waiter (e.g. a timed-out agent) must not
+            # cancel the flight the other callers share; the result still lands in the cache
+            task = asyncio.get_running_loop().create_task(self._arun(key, future, fn))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def do_background(self, key, fn):
+        """
+        Start fn() on a daemon thread unless a call for key is already in flight.
+        """
+        future, leader = self._join(key)
+        if leader:
+            threading.Thread(target=self._run, args=(key, future, fn), daemon=True).start()
+
+    def ado_background(self, key, fn):
+        """
+        Schedule fn() as a task on the running loop unless a call for key is already in flight.
+        """
+        future, leader = self._join(key)
+        if leader:
+            task = asyncio.get_running_loop().create_task(self._arun(key, future, fn))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
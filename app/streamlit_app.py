@@ -1,11 +1,26 @@
+import os
+import logging
 import streamlit as st
-from itinerary import generate_itinerary, generate_itinerary_stream
-from utils import parse_llm_output
-from pdf_utils import export_itinerary_pdf
+from itinerary_schema import Itinerary
+from metrics import start_metrics_server
+from conversation_memory import ConversationMemory
 import datetime as _date
+import uuid
+
+# With ITINERARY_API_URL set the app is a thin client of server.py
+if os.getenv("ITINERARY_API_URL"):
+    from itinerary_client import generate_itinerary_stream
+else:
+    from itinerary import generate_itinerary_stream
+
+# Pipeline reports (prompt token savings, agent timeouts, session reuse) go to stderr
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
 st.set_page_config(page_title="Travel Planner AI", page_icon="✈️", layout="wide")
 
+# /metrics + /metrics.json when METRICS_PORT is set (started once per process)
+start_metrics_server()
+
 # -------------------- Custom CSS --------------------
 st.markdown(
     """
@@ -60,14 +75,14 @@ st.markdown(
 # -------------------- Session State --------------------
 if "mode" not in st.session_state:
     st.session_state.mode = "Free Chat"
+if "session_id" not in st.session_state:
+    # lets refinements reuse agent data from this browser session's last run
+    st.session_state.session_id = uuid.uuid4().hex
+# Bounded chat histories: recent messages in memory, older ones archived to disk
 if "history_free" not in st.session_state:
-    st.session_state.history_free = []
+    st.session_state.history_free = ConversationMemory(f"{st.session_state.session_id}:free")
 if "history_structured" not in st.session_state:
-    st.session_state.history_structured = []
-if "last_itinerary_structured" not in st.session_state:
-    st.session_state.last_itinerary_structured = None
-if "last_itinerary_free" not in st.session_state:
-    st.session_state.last_itinerary_free = None
+    st.session_state.history_structured = ConversationMemory(f"{st.session_state.session_id}:structured")
 
 # -------------------- Sidebar --------------------
 with st.sidebar:
@@ -103,35 +118,36 @@ if st.session_state.mode == "Free Chat":
     st.subheader("💬 Free Travel Chat")
 
     # Show history
-    for msg in st.session_state.history_free:
+    if st.session_state.history_free.archived:
+        st.caption(f"{st.session_state.history_free.archived} earlier messages archived")
+    for msg in st.session_state.history_free.messages:
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
 
     if prompt := st.chat_input("Type your travel request..."):
-        st.session_state.history_free.append({"role": "user", "content": prompt})
+        st.session_state.history_free.add("user", prompt)
         with st.chat_message("user"):
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
             streamed_text = st.write_stream(generate_itinerary_stream({"user_prompt": prompt}))
 
-        st.session_state.history_free.append({"role": "assistant", "content": streamed_text})
-        st.session_state.last_itinerary_free = streamed_text
+        st.session_state.history_free.add("assistant", streamed_text)
 
     # Show buttons only if something generated
-    if st.session_state.last_itinerary_free:
+    if st.session_state.history_free.latest_itinerary:
         col1, col2 = st.columns(2)
         with col1:
             if st.button("🧹 Clear Free Chat History"):
-                st.session_state.history_free = []
-                st.session_state.last_itinerary_free = None
+                st.session_state.history_free.clear()
                 st.rerun()
         with col2:
             if st.button("📄 Export Itinerary as PDF"):
-                parsed = parse_llm_output(st.session_state.last_itinerary_free)
-                if not isinstance(parsed, dict) or "day_wise_plan" not in parsed:
-                    parsed = {"raw": st.session_state.last_itinerary_free}
-                pdf_path = export_itinerary_pdf(st.session_state.last_itinerary_free, "itinerary.pdf")
+                from pdf_utils import export_itinerary_pdf  # reportlab loads on first export
+
+                latest = st.session_state.history_free.latest_itinerary
+                itinerary = Itinerary.from_llm_text(latest)
+                pdf_path = export_itinerary_pdf(itinerary or latest, "itinerary.pdf")
                 with open(pdf_path, "rb") as f:
                     st.download_button("⬇️ Download PDF", f, file_name="itinerary.pdf")
 
@@ -147,9 +163,10 @@ if st.session_state.mode == "Free Chat":
 elif st.session_state.mode == "Structured Planner":
     st.subheader("📑 Structured Travel Planner")
 
-    # Generate itinerary from sidebar inputs
-    if 'generate_btn' in locals() and generate_btn:
-        payload = {
+    def structured_payload():
+        # Same fields for the first plan and every refinement, so unchanged
+        # agent inputs are recognised and their data reused
+        return {
             "origin": origin.strip(),
             "destination": destination.strip(),
             "destination_code": destination_code.strip() or None,
@@ -162,57 +179,57 @@ elif st.session_state.mode == "Structured Planner":
             "num_travelers": int(num_travelers),
         }
 
-        st.session_state.history_structured = []
+    # Generate itinerary from sidebar inputs
+    if 'generate_btn' in locals() and generate_btn:
+        payload = structured_payload()
+
+        st.session_state.history_structured.clear()
         with st.chat_message("assistant"):
-            streamed_text = st.write_stream(generate_itinerary_stream(payload))
+            streamed_text = st.write_stream(
+                generate_itinerary_stream(payload, session_id=st.session_state.session_id)
+            )
 
-        st.session_state.history_structured.append({"role": "assistant", "content": streamed_text})
-        st.session_state.last_itinerary_structured = streamed_text
+        st.session_state.history_structured.add("assistant", streamed_text)
 
     # Display chat history for structured refinements
-    for msg in st.session_state.history_structured:
+    if st.session_state.history_structured.archived:
+        st.caption(f"{st.session_state.history_structured.archived} earlier messages archived")
+    for msg in st.session_state.history_structured.messages:
         with st.chat_message(msg["role"]):
             st.markdown(msg["content"])
 
     # Refinement chat (only if itinerary exists)
-    if st.session_state.last_itinerary_structured:
+    if st.session_state.history_structured.latest_itinerary:
         if prompt := st.chat_input("Refine your itinerary... (e.g., cheaper hotels, add adventure)"):
-            st.session_state.history_structured.append({"role": "user", "content": prompt})
+            # Latest itinerary verbatim + compact notes on earlier turns, within MEMORY_TOKEN_BUDGET
+            conversation = st.session_state.history_structured.build_prompt(prompt)
+            st.session_state.history_structured.add("user", prompt)
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            conversation = "\n".join(
-                [f"{m['role'].capitalize()}: {m['content']}" for m in st.session_state.history_structured[-5:]]
-            )
             with st.chat_message("assistant"):
                 streamed_text = st.write_stream(
-                    generate_itinerary_stream({
-                        "user_prompt": conversation,
-                        "origin": origin,
-                        "destination": destination,
-                        "country": country,
-                        "days": days,
-                        "target_currency": target_currency,
-                        "interests": [x.strip() for x in interests.split(",") if x.strip()],
-                    })
+                    generate_itinerary_stream(
+                        {**structured_payload(), "user_prompt": conversation},
+                        session_id=st.session_state.session_id,
+                    )
                 )
 
-            st.session_state.history_structured.append({"role": "assistant", "content": streamed_text})
-            st.session_state.last_itinerary_structured = streamed_text
+            st.session_state.history_structured.add("assistant", streamed_text)
 
         # Buttons after structured plan
         col1, col2 = st.columns(2)
         with col1:
             if st.button("🧹 Clear Structured Chat History"):
-                st.session_state.history_structured = []
-                st.session_state.last_itinerary_structured = None
+                st.session_state.history_structured.clear()
                 st.rerun()
         with col2:
             if st.button("📄 Export Itinerary as PDF"):
-                parsed = parse_llm_output(st.session_state.last_itinerary_structured)
-                if not isinstance(parsed, dict) or "day_wise_plan" not in parsed:
-                    parsed = {"raw": st.session_state.last_itinerary_structured}
-                pdf_path = export_itinerary_pdf(st.session_state.last_itinerary_structured, "itinerary.pdf")
+                from pdf_utils import export_itinerary_pdf  # reportlab loads on first export
+
+                latest = st.session_state.history_structured.latest_itinerary
+                itinerary = Itinerary.from_llm_text(latest)
+                pdf_path = export_itinerary_pdf(itinerary or latest, "itinerary.pdf")
                 with open(pdf_path, "rb") as f:
                     st.download_button("⬇️ Download PDF", f, file_name="itinerary.pdf")
 
@@ -1,28 +1,82 @@
-from langsmith import Client
-import csv, os
+import os
+import csv
+import time
+import queue
+import atexit
+import sqlite3
+import logging
+import threading
 from datetime import datetime
+from dotenv import load_dotenv
 
-client_ls = Client()
+try:
+    import fcntl
+except ImportError:  # Windows: rely on the in-process lock only
+    fcntl = None
+
+load_dotenv()
+logger = logging.getLogger(__name__)
 
 CSV_FILE = "usage_log.csv"
 DEFAULT_PROJECT = "TravelPlannerAI"
 
-# CSV header 
-if not os.path.exists(CSV_FILE):
-    with open(CSV_FILE, "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            "timestamp", "mode", "input_tokens", "output_tokens", "total_tokens", "cost_usd"
-        ])
+# "csv" (default), "sqlite" or "parquet"
+USAGE_LOG_BACKEND = os.getenv("USAGE_LOG_BACKEND", "csv")
+USAGE_LOG_PATH = os.getenv("USAGE_LOG_PATH", "")
+USAGE_QUEUE_SIZE = int(os.getenv("USAGE_QUEUE_SIZE", "10000"))
+USAGE_BATCH_SIZE = int(os.getenv("USAGE_BATCH_SIZE", "200"))
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "2"))
+
+# gemini-2.5-flash list price, USD per 1M tokens
+PRICE_PER_M_INPUT = float(os.getenv("PRICE_PER_M_INPUT", "0.30"))
+PRICE_PER_M_OUTPUT = float(os.getenv("PRICE_PER_M_OUTPUT", "2.50"))
+
+FIELDS = ["timestamp", "mode", "input_tokens", "output_tokens", "total_tokens", "cost_usd"]
+_EMPTY_USAGE = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cost_usd": 0.0}
+
+
+def estimate_cost(input_tokens: int, output_tokens: int) -> float:
+    return round(input_tokens * PRICE_PER_M_INPUT / 1e6 + output_tokens * PRICE_PER_M_OUTPUT / 1e6, 6)
+
+
+def usage_from_response(response) -> dict:
+    """
+    Token usage straight from a model response, no LangSmith lookup.
+    Understands google-genai responses (usage_metadata.*_token_count) and
+    LangChain messages (usage_metadata dict with input/output/total_tokens).
+    """
+    meta = getattr(response, "usage_metadata", None)
+    if not meta:
+        return dict(_EMPTY_USAGE)
+    if isinstance(meta, dict):
+        input_tokens = meta.get("input_tokens", 0) or 0
+        output_tokens = meta.get("output_tokens", 0) or 0
+        total = meta.get("total_tokens", 0) or input_tokens + output_tokens
+    else:
+        input_tokens = getattr(meta, "prompt_token_count", 0) or 0
+        # thinking tokens are billed as output
+        output_tokens = (getattr(meta, "candidates_token_count", 0) or 0) + (getattr(meta, "thoughts_token_count", 0) or 0)
+        total = getattr(meta, "total_token_count", 0) or input_tokens + output_tokens
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": total,
+        "cost_usd": estimate_cost(input_tokens, output_tokens),
+    }
+
 
 def get_last_run_usage(project_name: str = DEFAULT_PROJECT):
     """
     Fetch the last run usage from LangSmith project.
+    Offline/reporting use only: it is a network call and may pick up another
+    session's run, so the request path uses usage_from_response instead.
     """
-    runs = list(client_ls.list_runs(project_name=project_name, limit=1, order="desc"))
+    from langsmith import Client
+
+    runs = list(Client().list_runs(project_name=project_name, limit=1, order="desc"))
     if not runs:
-        return {"input_tokens":0, "output_tokens":0, "total_tokens":0, "cost_usd":0.0}
-    
+        return dict(_EMPTY_USAGE)
+
     run = runs[0]
     meta = run.extra.get("usage_metadata", {})
     return {
@@ -32,18 +86,161 @@ def get_last_run_usage(project_name: str = DEFAULT_PROJECT):
         "cost_usd": meta.get("total_cost", 0.0)
     }
 
-def log_usage(mode: str, project_name: str = DEFAULT_PROJECT):
-    """
-    Append usage (tokens + cost) into CSV.
-    """
-    usage = get_last_run_usage(project_name)
-    with open(CSV_FILE, "a", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow([
-            datetime.now().isoformat(),
-            mode,
-            usage["input_tokens"],
-            usage["output_tokens"],
-            usage["total_tokens"],
-            usage["cost_usd"]
-        ])
+
+#  SINKS (each writes one batch of rows)
+
+class _FileLock:
+    """
+    Cross-process advisory lock on `<path>.lock` (no-op where fcntl is unavailable).
+    """
+
+    def __init__(self, path: str):
+        self.path = f"{path}.lock"
+        self._fh = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fh = open(self.path, "a")
+            fcntl.flock(self._fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fh is not None:
+            fcntl.flock(self._fh, fcntl.LOCK_UN)
+            self._fh.close()
+            self._fh = None
+
+
+def _write_csv(path: str, rows: list):
+    with _FileLock(path):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(FIELDS)
+            writer.writerows([[row[k] for k in FIELDS] for row in rows])
+
+
+def _write_sqlite(path: str, rows: list):
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage_log (timestamp TEXT, mode TEXT, input_tokens INTEGER, "
+            "output_tokens INTEGER, total_tokens INTEGER, cost_usd REAL)"
+        )
+        conn.executemany(
+            "INSERT INTO usage_log VALUES (?, ?, ?, ?, ?, ?)",
+            [[row[k] for k in FIELDS] for row in rows],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _write_parquet(path: str, rows: list):
+    # One part file per batch inside `path/`, so writers never rewrite each other's data
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(path, exist_ok=True)
+    table = pa.Table.from_pylist(rows)
+    part = os.path.join(path, f"part-{time.time_ns()}-{os.getpid()}.parquet")
+    pq.write_table(table, part)
+
+
+_SINKS = {
+    "csv": (_write_csv, CSV_FILE),
+    "sqlite": (_write_sqlite, "usage_log.sqlite3"),
+    "parquet": (_write_parquet, "usage_log.parquet"),
+}
+
+
+class UsageWriter:
+    """
+    Bounded in-process queue drained by a background thread that writes in batches.
+    Records are dropped (and counted) rather than blocking a request when the queue is full.
+    """
+
+    _STOP = object()
+
+    def __init__(self, backend: str = USAGE_LOG_BACKEND, path: str = USAGE_LOG_PATH,
+                 max_queue: int = USAGE_QUEUE_SIZE, batch_size: int = USAGE_BATCH_SIZE,
+                 flush_interval: float = USAGE_FLUSH_INTERVAL):
+        self._sink, default_path = _SINKS[backend]
+        self.path = path or default_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="usage-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, row: dict):
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write(self, rows: list):
+        if not rows:
+            return
+        try:
+            self._sink(self.path, rows)
+        except Exception:
+            logger.exception("usage log flush failed (%d rows lost)", len(rows))
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is self._STOP:
+                self._write(batch)
+                return
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def close(self, timeout: float = 10.0):
+        """
+        Flush everything queued so far and stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+usage_writer = UsageWriter()
+atexit.register(usage_writer.close)
+
+
+def log_usage(mode: str, usage: dict = None):
+    """
+    Queue one usage record (tokens + cost); the background writer persists it.
+    `usage` is a dict from usage_from_response; missing usage is logged as zeros.
+    """
+    usage = usage or _EMPTY_USAGE
+    usage_writer.submit({
+        "timestamp": datetime.now().isoformat(),
+        "mode": mode,
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+        "total_tokens": usage.get("total_tokens", 0),
+        "cost_usd": usage.get("cost_usd", 0.0),
+    })
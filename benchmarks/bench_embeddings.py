@@ -0,0 +1,90 @@
+"""
+Compare embedding backends on the bundled travel blogs.
+
+Query latency is measured one query at a time with the embedding cache bypassed,
+so every call pays the real backend cost.
+
+    python benchmarks/bench_embeddings.py --backends gemini,local --queries 50
+"""
+import os
+import sys
+import glob
+import time
+import argparse
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from embeddings import BACKENDS, LocalBackend  # noqa: E402
+from ingest import chunk_text  # noqa: E402
+
+
+def load_corpus(data_path: str) -> tuple[list[str], list[str]]:
+    chunks, queries = [], []
+    for path in sorted(glob.glob(os.path.join(data_path, "*.txt"))):
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        chunks.extend(chunk_text(text))
+        # Use the individual bullet / list lines as realistic short queries
+        queries.extend(line.strip(" -0123456789.") for line in text.splitlines() if len(line.strip()) > 20)
+    return chunks, queries
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def bench_backend(backend, chunks: list[str], queries: list[str]) -> dict:
+    backend.encode(queries[:1])  # load model / open connection outside the timings
+
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        backend.encode([query])
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    matrix = backend.encode(chunks)
+    batch_seconds = time.perf_counter() - started
+
+    return {
+        "backend": backend.name,
+        "model": backend.model_name,
+        "dim": matrix.shape[1],
+        "qps": len(latencies) / sum(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "docs_per_sec": len(chunks) / batch_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backends", default="gemini,local")
+    parser.add_argument("--data-path", default=os.path.join(ROOT, "data", "travel_blogs"))
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=None, help="CPU threads for the local backend")
+    args = parser.parse_args()
+
+    chunks, queries = load_corpus(args.data_path)
+    queries = (queries * (args.queries // max(len(queries), 1) + 1))[:args.queries]
+    print(f"{len(chunks)} chunks, {len(queries)} queries")
+
+    for name in args.backends.split(","):
+        name = name.strip()
+        backend = LocalBackend(threads=args.threads) if name == "local" and args.threads else BACKENDS[name]()
+        try:
+            r = bench_backend(backend, chunks, queries)
+        except Exception as e:
+            print(f"{name:>8}: failed ({e})")
+            continue
+        print(
+            f"{r['backend']:>8}: {r['qps']:8.1f} q/s  p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  "
+            f"batch {r['docs_per_sec']:8.1f} docs/s  dim {r['dim']}  ({r['model']})"
+        )
+
+
+if __name__ == "__main__":
+    main()
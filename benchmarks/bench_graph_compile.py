@@ -0,0 +1,48 @@
+"""
+Per-request graph overhead: rebuilding + compiling the LangGraph workflows on
+every call (old behaviour) vs. reusing the process-wide compiled graphs.
+
+    python benchmarks/bench_graph_compile.py --requests 200
+"""
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+# Building graphs never calls Gemini; a placeholder key is enough to import
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-placeholder")
+
+import itinerary  # noqa: E402
+
+
+def per_call_ms(fn, n: int) -> float:
+    started = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - started) / n * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    itinerary.get_prep_graph()
+    itinerary.get_full_graph()
+    first = (time.perf_counter() - started) * 1000
+    print(f"one-time compile of both graphs: {first:.2f} ms")
+
+    for label, build, cached in [
+        ("prep", itinerary.build_prep_graph, itinerary.get_prep_graph),
+        ("full", itinerary.build_full_graph_with_llm, itinerary.get_full_graph),
+    ]:
+        rebuild = per_call_ms(build, args.requests)
+        reuse = per_call_ms(cached, args.requests)
+        print(f"{label}: rebuild {rebuild:8.3f} ms/request  reuse {reuse:8.5f} ms/request  saved {rebuild - reuse:8.3f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Cold-start cost of the app's imports, per module (python -X importtime).
+
+Each run is a fresh interpreter that imports what streamlit_app.py imports
+before its first render; the fastest of --runs is compared to --budget-ms.
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --module itinerary --top 30 --first-use
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app")
+
+# App modules streamlit_app.py imports at the top (streamlit itself via --with-streamlit)
+FIRST_RENDER_MODULES = ["itinerary", "itinerary_schema", "metrics", "conversation_memory"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+_PROBE = """
+import os, sys, json, time
+sys.path.insert(0, {app!r})
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-placeholder")
+started = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+result = {{"import_s": time.perf_counter() - started, "first_use": {{}}}}
+if {first_use!r}:
+    import itinerary
+    for label, fn in [
+        ("genai client", itinerary.get_client),
+        ("free chat chain", itinerary.get_free_chat_chain),
+        ("prep graph", itinerary.get_prep_graph),
+        ("full graph", itinerary.get_full_graph),
+    ]:
+        t = time.perf_counter()
+        try:
+            fn()
+            result["first_use"][label] = time.perf_counter() - t
+        except Exception as e:
+            result["first_use"][label] = f"{{type(e).__name__}}: {{e}}"
+print(json.dumps(result))
+"""
+
+
+def profile_once(modules: list, first_use: bool) -> tuple:
+    code = _PROBE.format(app=APP, modules=modules, first_use=first_use)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=APP,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "probe failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append({"module": name, "self_us": int(self_us), "cumulative_us": int(cumulative_us),
+                         "depth": len(indent) // 2})
+    return json.loads(proc.stdout.strip().splitlines()[-1]), rows
+
+
+def by_package(rows: list) -> dict:
+    """
+    Self time summed per top-level package (what a lazy import would save).
+    """
+    totals = defaultdict(int)
+    for row in rows:
+        totals[row["module"].split(".")[0]] += row["self_us"]
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", action="append", help="module(s) to import (default: the first-render set)")
+    parser.add_argument("--with-streamlit", action="store_true", help="include streamlit itself")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters; the fastest is reported")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--first-use", action="store_true", help="also time the deferred clients and graphs")
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args()
+
+    modules = args.module or list(FIRST_RENDER_MODULES)
+    if args.with_streamlit:
+        modules = ["streamlit"] + modules
+
+    runs = [profile_once(modules, args.first_use) for _ in range(max(1, args.runs))]
+    result, rows = min(runs, key=lambda run: run[0]["import_s"])
+    import_ms = result["import_s"] * 1000
+
+    print(f"modules: {', '.join(modules)}")
+    print(f"import wall time: {import_ms:.0f} ms (fastest of {len(runs)}; budget {args.budget_ms:.0f} ms)")
+
+    print(f"\n{'top-level package':<36}{'self ms':>10}")
+    packages = by_package(rows)
+    for name, us in list(packages.items())[:args.top]:
+        print(f"{name:<36}{us / 1000:>10.1f}")
+
+    print(f"\n{'module (cumulative)':<52}{'cumul ms':>10}{'self ms':>10}")
+    for row in sorted(rows, key=lambda r: -r["cumulative_us"])[:args.top]:
+        label = "  " * min(row["depth"], 4) + row["module"]
+        print(f"{label:<52}{row['cumulative_us'] / 1000:>10.1f}{row['self_us'] / 1000:>10.1f}")
+
+    if result["first_use"]:
+        print(f"\n{'deferred until first use':<36}{'ms':>10}")
+        for label, value in result["first_use"].items():
+            print(f"{label:<36}{value * 1000:>10.1f}" if isinstance(value, float) else f"{label:<36}  {value}")
+
+    if args.json:
+        report = {"modules": modules, "import_ms": import_ms, "budget_ms": args.budget_ms,
+                  "packages_us": packages, "imports": rows, "first_use_s": result["first_use"]}
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if import_ms > args.budget_ms:
+        print(f"\nover budget by {import_ms - args.budget_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+parse_llm_output on large synthetic itineraries: the old regex + eval() repair
+vs. the single-pass tolerant parser in json_stream.
+
+    python benchmarks/bench_parse_llm_output.py --days 30 90 365 --repeat 20
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from json_stream import StreamingJSONParser  # noqa: E402
+
+
+def legacy_parse_llm_output(llm_text: str):
+    """
+    Previous implementation, kept here as the baseline.
+    """
+    try:
+        cleaned = llm_text.strip()
+        if cleaned.startswith("```"):
+            cleaned = cleaned.split("```json")[-1].split("```")[0].strip()
+            cleaned = cleaned.replace("```", "").strip()
+        cleaned = re.sub(r'"\s*"(?!\s*:)', '", "', cleaned)
+        if '"budget_breakdown"' in cleaned:
+            cleaned = re.sub(r'("flights":\s*".+?")\s*("stay")', r'\1, \2', cleaned, flags=re.DOTALL)
+            cleaned = re.sub(r'("stay":\s*".+?")\s*("food")', r'\1, \2', cleaned, flags=re.DOTALL)
+            cleaned = re.sub(r'("food":\s*".+?")\s*("activities")', r'\1, \2', cleaned, flags=re.DOTALL)
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        try:
+            parsed = eval(cleaned, {"__builtins__": None}, {})
+            return json.loads(json.dumps(parsed))
+        except Exception as e:
+            return {"error": f"Failed to parse LLM output: {e}", "raw": llm_text}
+
+
+def synthetic_output(days: int, seed: int = 0, broken: bool = True) -> str:
+    rng = random.Random(seed)
+    words = "beach fort market temple cafe sunset trek museum seafood cruise spice garden".split()
+
+    def sentence(n=18):
+        return " ".join(rng.choice(words) for _ in range(n)).capitalize() + "."
+
+    plan = [
+        {
+            "day": d,
+            "morning": sentence(), "afternoon": sentence(), "evening": sentence(),
+            "meals": sentence(8), "est_cost": f"${rng.randint(40, 200)}",
+            "budget_breakdown": {"flights": "$0", "stay": f"${rng.randint(20, 90)}", "food": "$25", "activities": "$30"},
+        }
+        for d in range(1, days + 1)
+    ]
+    doc = {
+        "day_wise_plan": plan,
+        "weather_summary": sentence(30),
+        "top_attractions": [sentence(3) for _ in range(10)],
+        "recommendations": [sentence(12) for _ in range(10)],
+    }
+    text = json.dumps(doc, indent=2)
+    if broken:
+        # the kinds of damage seen in real responses: dropped commas and trailing commas
+        text = text.replace('",\n      "afternoon"', '"\n      "afternoon"')
+        text = text.replace('"$25",', '"$25"')
+        text = text.replace("}\n  ],", "},\n  ],")
+    return f"```json\n{text}\n```"
+
+
+def bench(fn, text: str, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def tolerant(text: str):
+    parser = StreamingJSONParser()
+    parser.feed(text)
+    return parser.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 90, 365])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for days in args.days:
+        for broken in (False, True):
+            text = synthetic_output(days, broken=broken)
+            ok_new = len((tolerant(text) or {}).get("day_wise_plan", [])) == days
+            ok_old = len(legacy_parse_llm_output(text).get("day_wise_plan", [])) == days
+            old_ms = bench(legacy_parse_llm_output, text, args.repeat)
+            new_ms = bench(tolerant, text, args.repeat)
+            label = "damaged" if broken else "clean"
+            print(
+                f"{days:4d} days {label:>7} ({len(text) / 1024:7.1f} KiB): "
+                f"legacy {old_ms:8.2f} ms ({'ok' if ok_old else 'FAILED'})  "
+                f"tolerant {new_ms:8.2f} ms ({'ok' if ok_new else 'FAILED'})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+End-to-end pipeline throughput and latency with no network: recorded API
+fixtures, fake Gemini/LangChain models and injected latency/errors (offline.py).
+
+    python benchmarks/bench_pipeline.py --mode stream --requests 200 --concurrency 16
+    python benchmarks/bench_pipeline.py --mode mixed --api-error-rate 0.05 --json report.json
+"""
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import offline
+
+DESTINATIONS = [
+    {"destination": "Manali", "destination_code": "DEL", "country": "India"},
+    {"destination": "Shimla", "destination_code": "DEL", "country": "India"},
+    {"destination": "Ooty", "destination_code": "MAA", "country": "India"},
+    {"destination": "Darjeeling", "destination_code": "CCU", "country": "India"},
+]
+MODES = ("structured", "stream", "free_chat", "free_chat_stream")
+
+
+def make_request(i: int, mode: str) -> dict:
+    if mode.startswith("free_chat"):
+        dest = DESTINATIONS[i % len(DESTINATIONS)]["destination"]
+        return {"user_prompt": f"Plan a {3 + i % 5}-day trip from Delhi to {dest} (request {i})"}
+    return {
+        "origin": "DEL",
+        **DESTINATIONS[i % len(DESTINATIONS)],
+        "days": 3 + i % 5,
+        "date": "2025-05-10",
+        "budget_currency": "USD",
+        "target_currency": "INR",
+        "interests": ["food", "trekking"],
+        "user_prompt": f"benchmark request {i}",
+    }
+
+
+def run_one(itinerary, i: int, mode: str) -> dict:
+    request = make_request(i, mode)
+    started = time.perf_counter()
+    first = None
+    try:
+        if mode in ("stream", "free_chat_stream"):
+            for _ in itinerary.generate_itinerary_stream(request):
+                if first is None:
+                    first = time.perf_counter() - started
+        else:
+            itinerary.generate_itinerary(request)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    total = time.perf_counter() - started
+    return {"mode": mode, "total": total, "first_chunk": first if first is not None else total, "error": error}
+
+
+def percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def summarize(results: list, wall: float) -> dict:
+    ok = [r for r in results if r["error"] is None]
+    summary = {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "wall_s": wall,
+        "throughput_rps": len(results) / wall if wall else None,
+    }
+    for field in ("total", "first_chunk"):
+        values = [r[field] * 1000 for r in ok]
+        summary[field] = {
+            "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95),
+            "p99_ms": percentile(values, 0.99),
+            "max_ms": max(values) if values else None,
+        }
+    return summary
+
+
+def _ms(value):
+    return "-" if value is None else f"{value:8.1f}"
+
+
+def print_report(summary: dict, by_mode: dict, stages: dict):
+    print(f"requests={summary['requests']} errors={summary['errors']} "
+          f"wall={summary['wall_s']:.2f}s throughput={summary['throughput_rps']:.2f} req/s")
+    print(f"{'latency (ms)':<24}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for label, stats in [("all / total", summary["total"]), ("all / first chunk", summary["first_chunk"])] + [
+        (f"{mode} / total", s["total"]) for mode, s in by_mode.items()
+    ]:
+        print(f"{label:<24}{_ms(stats['p50_ms'])} {_ms(stats['p95_ms'])} {_ms(stats['p99_ms'])} {_ms(stats['max_ms'])}")
+
+    # Stage numbers come from the app's own histograms: mean is exact, p95 is a bucket bound
+    print(f"\n{'stage':<44}{'count':>7}{'mean ms':>10}{'p95 <= ms':>11}")
+    for h in stages["histograms"]:
+        if not h["count"]:
+            continue
+        label = h["name"] + "{" + ",".join(f"{k}={v}" for k, v in sorted(h["labels"].items())) + "}"
+        unit = 1 if h["name"] == "llm_tokens_per_second" else 1000
+        mean = h["mean"] * unit
+        p95 = None if h["p95"] is None else h["p95"] * unit
+        print(f"{label:<44}{h['count']:>7}{mean:>10.1f}{'-' if p95 is None else f'{p95:.0f}':>11}")
+    failures = [c for c in stages["counters"] if c["labels"].get("status") not in ("200", None)]
+    for c in failures:
+        print(f"upstream {c['labels']['endpoint']} status={c['labels']['status']}: {c['value']:.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mode", choices=MODES + ("mixed",), default="stream")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--caches", action="store_true", help="keep API/response caches on (warm-cache numbers)")
+    parser.add_argument("--api-latency-ms", type=float, default=120)
+    parser.add_argument("--api-jitter", type=float, default=0.3)
+    parser.add_argument("--api-error-rate", type=float, default=0.0)
+    parser.add_argument("--rag-latency-ms", type=float, default=40)
+    parser.add_argument("--llm-ttft-ms", type=float, default=600)
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=150)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="also write the full report (summary + raw histograms) here")
+    args = parser.parse_args()
+
+    profile = offline.Profile(
+        api_latency_ms=args.api_latency_ms, api_jitter=args.api_jitter, api_error_rate=args.api_error_rate,
+        rag_latency_ms=args.rag_latency_ms, llm_ttft_ms=args.llm_ttft_ms,
+        llm_tokens_per_sec=args.llm_tokens_per_sec, llm_error_rate=args.llm_error_rate, seed=args.seed,
+    )
+    itinerary = offline.install(profile, caches=args.caches)
+    import metrics
+
+    modes = MODES if args.mode == "mixed" else (args.mode,)
+    for i in range(args.warmup):
+        for mode in modes:
+            run_one(itinerary, -1 - i, mode)
+    metrics.reset()
+
+    jobs = [(i, modes[i % len(modes)]) for i in range(args.requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda job: run_one(itinerary, *job), jobs))
+    wall = time.perf_counter() - started
+
+    summary = summarize(results, wall)
+    by_mode = {mode: summarize([r for r in results if r["mode"] == mode], wall) for mode in modes} if len(modes) > 1 else {}
+    stages = metrics.dump_json()
+    print(f"mode={args.mode} concurrency={args.concurrency} caches={'on' if args.caches else 'off'}")
+    print_report(summary, by_mode, stages)
+
+    errors = sorted({r["error"] for r in results if r["error"]})
+    for error in errors[:5]:
+        print("error:", error)
+
+    if args.json:
+        report = {"args": vars(args), "summary": summary, "by_mode": by_mode, "stages": stages, "errors": errors}
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
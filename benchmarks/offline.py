@@ -0,0 +1,379 @@
+"""
+Offline stand-ins for everything the pipeline reaches over the network, shared
+by bench_pipeline.py and record_fixtures.py.
+
+install() routes every upstream HTTP call (shared requests session and httpx
+pool) to the recorded responses in fixtures/recorded.json, swaps the Gemini
+client and the LangChain chat model for deterministic streaming fakes, and
+replaces RAG retrieval with recorded chunks. Latency and error rates come from
+a Profile, so runs are reproducible for a given seed.
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import tempfile
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "recorded.json")
+
+# Must be set before the app modules read them at import time
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-placeholder")
+os.environ.setdefault("USAGE_LOG_PATH", os.path.join(tempfile.gettempdir(), "travelcraft_bench_usage.csv"))
+os.environ["LANGSMITH_TRACING"] = "false"
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
+
+import httpx  # noqa: E402
+import requests  # noqa: E402
+from requests.adapters import HTTPAdapter  # noqa: E402
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+
+CHUNK_TOKENS = 12  # tokens per streamed piece, roughly what Gemini sends
+
+
+class Profile:
+    """
+    Injected latency (milliseconds, +/- jitter fraction) and failure rates.
+    """
+
+    def __init__(self, api_latency_ms: float = 120, api_jitter: float = 0.3, api_error_rate: float = 0.0,
+                 rag_latency_ms: float = 40, llm_ttft_ms: float = 600, llm_tokens_per_sec: float = 150,
+                 llm_error_rate: float = 0.0, seed: int = 7):
+        self.api_latency_ms = api_latency_ms
+        self.api_jitter = api_jitter
+        self.api_error_rate = api_error_rate
+        self.rag_latency_ms = rag_latency_ms
+        self.llm_ttft_ms = llm_ttft_ms
+        self.llm_tokens_per_sec = llm_tokens_per_sec
+        self.llm_error_rate = llm_error_rate
+        self.rng = random.Random(seed)
+
+    def api_delay(self) -> float:
+        return self.api_latency_ms / 1000 * self.rng.uniform(1 - self.api_jitter, 1 + self.api_jitter)
+
+    def api_fails(self) -> bool:
+        return self.rng.random() < self.api_error_rate
+
+    def llm_check(self):
+        if self.rng.random() < self.llm_error_rate:
+            raise RuntimeError("injected LLM failure")
+
+    def ttft(self) -> float:
+        return self.llm_ttft_ms / 1000
+
+    def piece_delay(self, tokens: int) -> float:
+        return tokens / self.llm_tokens_per_sec if self.llm_tokens_per_sec else 0.0
+
+
+def load_fixtures(path: str = FIXTURES) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+#  HTTP
+
+def routes():
+    """
+    (url prefix, endpoint) pairs; endpoint names match the http_client metric labels.
+    """
+    import api_wrappers as w
+    return [
+        (w.WEATHER_URL, "weather"),
+        (w.SERPAPI_URL, "places"),
+        (w.EXCHANGE_URL, "exchange_rate"),
+        (w.AMADEUS_TOKEN_URL, "amadeus_token"),
+        (w.AMADEUS_FLIGHTS_URL, "flights"),
+        (w.AMADEUS_HOTELS_URL, "hotels"),
+        (w.GOOGLE_TEXTSEARCH_URL, "google_places"),
+        (w.GOOGLE_DETAILS_URL, "place_details"),
+        ("https://restcountries.com/", "country_info"),
+        (w.UNSPLASH_URL, "photos"),
+    ]
+
+
+class FixtureResponder:
+    def __init__(self, fixtures: dict, profile: Profile):
+        self.http = fixtures["http"]
+        self.profile = profile
+        self.routes = routes()
+
+    def respond(self, url: str):
+        """
+        Returns (status, body, delay_seconds) for a request URL.
+        """
+        delay = self.profile.api_delay()
+        endpoint = next((name for prefix, name in self.routes if url.startswith(prefix)), None)
+        if endpoint is None or endpoint not in self.http:
+            return 404, {"error": {"message": f"no fixture for {url}"}}, delay
+        if self.profile.api_fails():
+            return 503, {"error": {"message": "injected upstream failure"}}, delay
+        recorded = self.http[endpoint]
+        return recorded["status"], recorded["body"], delay
+
+
+class FixtureAdapter(HTTPAdapter):
+    """
+    requests transport adapter that answers from fixtures instead of the network.
+    """
+
+    def __init__(self, responder: FixtureResponder):
+        super().__init__()
+        self.responder = responder
+
+    def send(self, request, **kwargs):
+        status, body, delay = self.responder.respond(request.url)
+        time.sleep(delay)
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode("utf-8")
+        response.headers["Content-Type"] = "application/json"
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+
+def _mock_transport(responder: FixtureResponder) -> httpx.MockTransport:
+    async def handler(request):
+        status, body, delay = responder.respond(str(request.url))
+        await asyncio.sleep(delay)
+        return httpx.Response(status, json=body)
+    return httpx.MockTransport(handler)
+
+
+#  LLM
+
+_DAYS = re.compile(r"(\d+)-day")
+
+
+def _days(prompt: str) -> int:
+    m = _DAYS.search(prompt)
+    return int(m.group(1)) if m else 3
+
+
+def itinerary_json(days: int) -> str:
+    return json.dumps({
+        "day_wise_plan": [
+            {
+                "day": d,
+                "morning": f"Day {d}: sunrise walk and breakfast at a local cafe, then a guided heritage visit.",
+                "afternoon": "Lunch near the market, followed by a valley excursion with a short trek.",
+                "evening": "Sunset viewpoint, then dinner with regional dishes in the old town.",
+                "meals": "Breakfast at the hotel, thali for lunch, trout or dham for dinner.",
+                "est_cost": "USD 45-70",
+            }
+            for d in range(1, days + 1)
+        ],
+        "weather_summary": "Mild days around 15-20C with cool nights; carry a light jacket and rain layer.",
+        "top_attractions": ["Hadimba Devi Temple", "Solang Valley", "Jogini Waterfall", "Mall Road"],
+        "recommendations": ["Book Rohtang permits early", "Start excursions before 9am", "Carry cash for local taxis"],
+    })
+
+
+def itinerary_markdown(days: int) -> str:
+    parts = ["# Your itinerary\n"]
+    for d in range(1, days + 1):
+        parts.append(
+            f"\n## Day {d}\n"
+            "- **Morning:** sunrise walk and breakfast at a local cafe, then a guided heritage visit.\n"
+            "- **Afternoon:** lunch near the market, followed by a valley excursion with a short trek.\n"
+            "- **Evening:** sunset viewpoint, then dinner with regional dishes in the old town.\n"
+            "- **Estimated cost:** USD 45-70\n"
+        )
+    parts.append(
+        "\n## Weather\nMild days around 15-20C with cool nights; carry a light jacket.\n"
+        "\n## Tips\n- Book permits early\n- Start excursions before 9am\n- Carry cash for local taxis\n"
+    )
+    return "".join(parts)
+
+
+def _pieces(text: str):
+    step = CHUNK_TOKENS * 4
+    return [text[i:i + step] for i in range(0, len(text), step)]
+
+
+def _genai_usage(prompt: str, text: str):
+    prompt_tokens, output_tokens = _tokens(prompt), _tokens(text)
+    return SimpleNamespace(
+        prompt_token_count=prompt_tokens,
+        candidates_token_count=output_tokens,
+        thoughts_token_count=0,
+        total_token_count=prompt_tokens + output_tokens,
+    )
+
+
+def _lc_usage(prompt: str, text: str) -> dict:
+    prompt_tokens, output_tokens = _tokens(prompt), _tokens(text)
+    return {"input_tokens": prompt_tokens, "output_tokens": output_tokens, "total_tokens": prompt_tokens + output_tokens}
+
+
+class _FakeModels:
+    def __init__(self, profile: Profile):
+        self.profile = profile
+
+    def generate_content(self, model, contents, config=None):
+        self.profile.llm_check()
+        text = _text_for(contents, config)
+        time.sleep(self.profile.ttft() + self.profile.piece_delay(_tokens(text)))
+        return SimpleNamespace(text=text, usage_metadata=_genai_usage(contents, text))
+
+    def generate_content_stream(self, model, contents, config=None):
+        self.profile.llm_check()
+        text = _text_for(contents, config)
+        pieces = _pieces(text)
+        time.sleep(self.profile.ttft())
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.profile.piece_delay(CHUNK_TOKENS))
+            last = i == len(pieces) - 1
+            yield SimpleNamespace(text=piece, usage_metadata=_genai_usage(contents, text) if last else None)
+
+
+class _FakeAsyncModels:
+    def __init__(self, profile: Profile):
+        self.profile = profile
+
+    async def generate_content(self, model, contents, config=None):
+        self.profile.llm_check()
+        text = _text_for(contents, config)
+        await asyncio.sleep(self.profile.ttft() + self.profile.piece_delay(_tokens(text)))
+        return SimpleNamespace(text=text, usage_metadata=_genai_usage(contents, text))
+
+
+def _text_for(prompt: str, config) -> str:
+    days = _days(prompt)
+    if isinstance(config, dict) and config.get("response_mime_type") == "application/json":
+        return itinerary_json(days)
+    return itinerary_markdown(days)
+
+
+class FakeGenAIClient:
+    """
+    The slice of google.genai.Client the pipeline uses: models.generate_content(_stream)
+    and aio.models.generate_content.
+    """
+
+    def __init__(self, profile: Profile):
+        self.models = _FakeModels(profile)
+        self.aio = SimpleNamespace(models=_FakeAsyncModels(profile))
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Stand-in for ChatGoogleGenerativeAI: streams a fixed Markdown itinerary with usage metadata.
+    """
+
+    profile: Profile
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline-fake"
+
+    @staticmethod
+    def _prompt(messages) -> str:
+        return "\n".join(str(m.content) for m in messages)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.profile.llm_check()
+        prompt = self._prompt(messages)
+        text = itinerary_markdown(_days(prompt))
+        time.sleep(self.profile.ttft() + self.profile.piece_delay(_tokens(text)))
+        message = AIMessage(content=text, usage_metadata=_lc_usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        self.profile.llm_check()
+        prompt = self._prompt(messages)
+        text = itinerary_markdown(_days(prompt))
+        pieces = _pieces(text)
+        time.sleep(self.profile.ttft())
+        for i, piece in enumerate(pieces):
+            if i:
+                time.sleep(self.profile.piece_delay(CHUNK_TOKENS))
+            last = i == len(pieces) - 1
+            usage = _lc_usage(prompt, text) if last else None
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece, usage_metadata=usage))
+
+
+#  CACHES
+
+class NullCache:
+    """
+    api_cache backend that never stores, so every run measures upstream calls.
+    """
+
+    def get(self, key):
+        return None
+
+    def set(self, key, payload, expires_at):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def size(self):
+        return {"entries": 0, "bytes": 0}
+
+
+def install(profile: Profile, fixtures: dict = None, caches: bool = False):
+    """
+    Point the pipeline at fixtures and fakes. With caches=False the API and
+    response caches are disabled so each request does the full amount of work.
+    """
+    import api_cache
+    import http_client
+    import itinerary
+    from response_cache import ResponseCache
+
+    fixtures = fixtures or load_fixtures()
+    responder = FixtureResponder(fixtures, profile)
+
+    adapter = FixtureAdapter(responder)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    http_client._session = session
+
+    transport = _mock_transport(responder)
+    clients = {}
+
+    def get_async_client():
+        loop = asyncio.get_running_loop()
+        client = clients.get(loop)
+        if client is None:
+            client = clients[loop] = httpx.AsyncClient(transport=transport)
+        return client
+
+    http_client.get_async_client = get_async_client
+
+    rag_chunks = fixtures.get("rag", [])
+
+    def query_documents(query, destination=None, k=5):
+        time.sleep(profile.rag_latency_ms / 1000)
+        return rag_chunks[:k]
+
+    itinerary.query_documents = query_documents
+    itinerary.client = FakeGenAIClient(profile)
+    itinerary.free_chat_chain = ChatPromptTemplate.from_template(itinerary.CHAT_PROMPT) | FakeChatModel(profile=profile)
+
+    if not caches:
+        api_cache.backend = NullCache()
+        itinerary.response_cache = ResponseCache(max_entries=0)
+    return itinerary
@@ -0,0 +1,77 @@
+"""
+Refresh fixtures/recorded.json from the live APIs (needs the real keys in .env).
+
+Every api_wrappers function is called once for the given trip; the raw upstream
+response of each endpoint that answered 200 replaces its recorded entry.
+
+    python benchmarks/record_fixtures.py --destination Manali --city-code DEL --country India
+"""
+import os
+import sys
+import json
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+FIXTURES = os.path.join(ROOT, "benchmarks", "fixtures", "recorded.json")
+
+import http_client  # noqa: E402
+import api_wrappers  # noqa: E402
+
+captured = {}
+_request_json = http_client.request_json
+
+
+def recording_request_json(method, url, params=None, headers=None, data=None, timeout=None, endpoint=None):
+    status, body = _request_json(method, url, params=params, headers=headers, data=data, timeout=timeout, endpoint=endpoint)
+    if status == 200:
+        captured[endpoint] = {"status": status, "body": body}
+    return status, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--origin", default="DEL")
+    parser.add_argument("--destination", default="Manali")
+    parser.add_argument("--city-code", default="DEL", help="IATA code for flights/hotels")
+    parser.add_argument("--country", default="India")
+    parser.add_argument("--date", default="2025-05-10")
+    parser.add_argument("--rag", action="store_true", help="also record RAG chunks from the local Chroma store")
+    args = parser.parse_args()
+
+    # get_json resolves request_json from http_client; the Amadeus token call imported it directly
+    http_client.request_json = recording_request_json
+    api_wrappers.request_json = recording_request_json
+
+    api_wrappers.get_weather(args.destination, 7)
+    api_wrappers.search_places("attractions", args.destination, 6)
+    api_wrappers.get_exchange_rate("USD", "INR")
+    api_wrappers.search_flights(args.origin, args.city_code, args.date)
+    api_wrappers.search_hotels(args.city_code)
+    results = api_wrappers.search_google_places(f"popular activities in {args.destination}", "0,0")
+    if isinstance(results, list) and results:
+        api_wrappers.get_place_details(results[0]["place_id"])
+    api_wrappers.get_country_info(args.country)
+    api_wrappers.get_destination_photo(args.destination, 3)
+
+    with open(FIXTURES, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    if "amadeus_token" in captured:
+        # never commit a live credential
+        captured["amadeus_token"]["body"]["access_token"] = "benchmarkAccessToken0000000000"
+    fixtures["http"].update(captured)
+
+    if args.rag:
+        from rag import query_documents
+        fixtures["rag"] = query_documents(f"Top attractions and travel info for {args.destination}", args.destination)
+
+    with open(FIXTURES, "w", encoding="utf-8") as f:
+        json.dump(fixtures, f, indent=1, ensure_ascii=False)
+    missing = sorted(set(fixtures["http"]) - set(captured))
+    print(f"recorded {len(captured)} endpoints: {', '.join(sorted(captured))}")
+    if missing:
+        print(f"kept previous fixtures for: {', '.join(missing)}")
+
+
+if __name__ == "__main__":
+    main()
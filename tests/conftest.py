@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# The app modules import each other by bare name (cd app && python ...)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+# Read by the app modules at import time
+os.environ.setdefault("GEMINI_API_KEY", "test-placeholder")
+os.environ.setdefault("USAGE_LOG_PATH", os.path.join(tempfile.gettempdir(), "travelcraft_test_usage.csv"))
+os.environ["LANGSMITH_TRACING"] = "false"
+os.environ["LANGCHAIN_TRACING_V2"] = "false"
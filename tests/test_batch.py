@@ -0,0 +1,44 @@
+import json
+
+import batch
+import itinerary
+
+BLOCKED = "prompt blocked (SAFETY)"
+
+
+class BlockedGraph:
+    """
+    Full graph whose LLM step came back blocked, as llm_agent reports it.
+    """
+
+    async def ainvoke(self, state):
+        return {
+            **state,
+            "itinerary": json.dumps({"error": f"No itinerary generated: {BLOCKED}"}),
+            "llm_error": BLOCKED,
+        }
+
+
+def _write_requests(path, *items):
+    path.write_text("".join(json.dumps(item) + "\n" for item in items), encoding="utf-8")
+
+
+def test_blocked_response_is_failed_and_retried_on_resume(tmp_path, monkeypatch):
+    monkeypatch.setattr(itinerary, "get_full_graph", lambda: BlockedGraph())
+    monkeypatch.setattr(itinerary.response_cache, "get", lambda *args, **kwargs: None)
+    requests_path = tmp_path / "campaign.jsonl"
+    output_path = tmp_path / "itineraries.jsonl"
+    _write_requests(requests_path, {"id": "manali", "request": {"destination": "Manali", "days": 2}})
+
+    stats = batch.run_batch(str(requests_path), str(output_path), concurrency=1)
+    assert stats["ok"] == 0
+    assert stats["failed"] == 1
+    row = json.loads(output_path.read_text(encoding="utf-8").splitlines()[-1])
+    assert row["status"] == "failed"
+    assert row["itinerary"] is None
+    assert BLOCKED in row["error"]
+
+    # A failed row is not a checkpoint: the next run retries it
+    stats = batch.run_batch(str(requests_path), str(output_path), concurrency=1)
+    assert stats["resumed"] == 0
+    assert stats["failed"] == 1